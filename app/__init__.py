@@ -7,7 +7,8 @@ from flask import Flask
 from flask_cors import CORS
 
 from app.config import config_map
-from app.extensions import db, migrate, cache, ma
+from app.extensions import db, migrate, cache, compress, ma, celery
+from app.json_provider import ORJSONProvider
 
 
 def create_app(config_name: str | None = None) -> Flask:
@@ -18,13 +19,20 @@ def create_app(config_name: str | None = None) -> Flask:
 
     app = Flask(__name__)
     app.config.from_object(config_map[config_name])
+    app.json = ORJSONProvider(app)
 
     # ── Initialise extensions ──────────────────────────────────────────
     db.init_app(app)
     migrate.init_app(app, db)
     cache.init_app(app)
+    compress.init_app(app)
     ma.init_app(app)
     CORS(app)
+    celery.conf.update(
+        broker_url=app.config["CELERY_BROKER_URL"],
+        task_always_eager=app.config["CELERY_TASK_ALWAYS_EAGER"],
+        task_ignore_result=True,
+    )
 
     # ── Register blueprints ────────────────────────────────────────────
     from app.api.leaderboard import leaderboard_bp
@@ -1,5 +1,9 @@
 """
-Analytics API — Detailed statistical breakdowns using window functions.
+Analytics API — Detailed statistical breakdowns.
+
+Per-row ranks, percentiles and tiers are materialised on leaderboard_snapshot
+(and exam-wide aggregates on exam_stats) by the rank refresh, so these reads
+are index-ordered pages and lookups rather than window-function queries.
 
 GET /api/v1/analytics/leaderboard?exam_id=<id>  — per-student analytics
 GET /api/v1/analytics/summary?exam_id=<id>      — exam-wide summary stats
@@ -11,113 +15,152 @@ GET /api/v1/analytics/student/<user_id>?exam_id=<id> — individual student deep
 from __future__ import annotations
 
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from sqlalchemy import text
 
+from app import json_provider
+from app.api.http_cache import conditional
+from app.api.pagination import decode_cursor, encode_cursor
 from app.extensions import db, cache
+from app.services import rank_tasks
+from app.services.scoring_engine import _leaderboard_cache_version
 
 analytics_bp = Blueprint("analytics", __name__)
 logger = logging.getLogger(__name__)
 
+# Cached pages are keyed by the exam's leaderboard version token (see
+# _versioned_cache_key), so a re-rank orphans them at once; the TTL only
+# bounds how long orphaned versions linger in Redis.
+_CACHE_TTL_SEC = 600
+
+
+@analytics_bp.after_request
+def _http_caching(response):
+    """ETag + Cache-Control on every analytics GET; 304 on a matching If-None-Match."""
+    return conditional(response)
+
 
 # ────────────────────────────────────────────────────────────────────────────
-# 1. Per-Student Leaderboard with Full Analytics (Window Functions)
+# 1. Per-Student Leaderboard with Full Analytics (Materialised Columns)
 # ────────────────────────────────────────────────────────────────────────────
 
+# Keyset seek past the cursor row, in (score DESC, time ASC, user_id ASC) order
+_SEEK_AFTER_CURSOR = """
+      AND (lb.total_score < :c_score
+           OR (lb.total_score = :c_score AND lb.total_time_sec > :c_time)
+           OR (lb.total_score = :c_score AND lb.total_time_sec = :c_time
+               AND lb.user_id > :c_user))"""
+
+_ANALYTICS_LEADERBOARD_SQL = """
+    SELECT
+        u.user_id,
+        u.username,
+        u.full_name,
+        lb.exam_id,
+        CAST(lb.weighted_coding AS DOUBLE)               AS weighted_coding,
+        CAST(lb.weighted_quiz AS DOUBLE)                 AS weighted_quiz,
+        CAST(lb.weighted_assessment AS DOUBLE)           AS weighted_assessment,
+        CAST(lb.total_score AS DOUBLE)                   AS total_score,
+        lb.total_time_sec,
+
+        lb.rank_position                                 AS `dense_rank`,
+        lb.standard_rank                                 AS `standard_rank`,
+        CAST(lb.percentile_rank AS DOUBLE)               AS `percentile_rank`,
+        lb.quartile                                      AS `quartile`,
+        lb.decile                                        AS `decile`,
+
+        CAST(lb.running_avg AS DOUBLE)                   AS running_avg,
+
+        CAST(st.avg_score AS DOUBLE)                     AS exam_avg,
+        CAST(st.stddev_score AS DOUBLE)                  AS exam_stddev,
+
+        CAST(ROUND(lb.total_score - st.avg_score, 4) AS DOUBLE) AS deviation,
+
+        CAST(lb.z_score AS DOUBLE)                       AS z_score,
+
+        lb.coding_rank                                   AS `coding_rank`,
+        lb.quiz_rank                                     AS `quiz_rank`,
+        lb.assessment_rank                               AS `assessment_rank`,
+        lb.speed_rank                                    AS `speed_rank`,
+
+        lb.performance_tier                              AS `performance_tier`,
+
+        st.participant_count                             AS `total_participants`
+
+    FROM leaderboard_snapshot lb
+    JOIN users u ON lb.user_id = u.user_id
+    LEFT JOIN exam_stats st ON st.exam_id = lb.exam_id
+    WHERE lb.exam_id = :exam_id{seek}
+    ORDER BY lb.total_score DESC, lb.total_time_sec ASC, lb.user_id ASC
+    LIMIT :limit OFFSET :offset
+"""
+
+# Offset-page and keyset-seek variants, each compiled once at import
+_ANALYTICS_LEADERBOARD_PAGE = text(_ANALYTICS_LEADERBOARD_SQL.format(seek=""))
+_ANALYTICS_LEADERBOARD_AFTER = text(_ANALYTICS_LEADERBOARD_SQL.format(seek=_SEEK_AFTER_CURSOR))
+
+
 @analytics_bp.route("/analytics/leaderboard", methods=["GET"])
-@cache.cached(timeout=10, query_string=True)
+@cache.cached(timeout=_CACHE_TTL_SEC, make_cache_key=lambda **_: _versioned_cache_key())
 def analytics_leaderboard():
     """
-    Returns every student with 20+ analytical metrics computed via
-    SQL window functions: DENSE_RANK, PERCENT_RANK, NTILE, LAG, LEAD,
-    running averages, Z-scores, performance tiers, etc.
+    Returns every student with 20+ analytical metrics.  Ranks, percentiles,
+    quartiles, z-scores and tiers are materialised on `leaderboard_snapshot`
+    by the scoring engine, and exam-wide aggregates come from `exam_stats`,
+    so the query is a plain index-ordered page with no window functions.
+    Rows the rank refresh has not reached yet are patched up by
+    _with_refresh_fallbacks.  Neighbour gaps are derived in Python from the
+    adjacent rows, fetching one extra row on each side of the page.
+
+    Pass `after=<next_cursor>` for keyset pagination; `page` is the OFFSET
+    fallback.
     """
-    exam_id = request.args.get("exam_id", type=int)
+    args = _args_ints("exam_id", "page", "per_page", defaults={"page": 1, "per_page": 50})
+    exam_id = args["exam_id"]
     if exam_id is None:
         return jsonify({"error": "exam_id is required"}), 400
 
-    page = max(1, request.args.get("page", 1, type=int))
-    per_page = min(100, max(1, request.args.get("per_page", 50, type=int)))
-    offset = (page - 1) * per_page
-
-    sql = text("""
-        SELECT
-            u.user_id,
-            u.username,
-            u.full_name,
-            lb.exam_id,
-            lb.weighted_coding,
-            lb.weighted_quiz,
-            lb.weighted_assessment,
-            lb.total_score,
-            lb.total_time_sec,
-
-            DENSE_RANK() OVER w_score                        AS `dense_rank`,
-            RANK() OVER w_score                              AS `standard_rank`,
-            ROW_NUMBER() OVER w_score                        AS `row_num`,
-            ROUND(PERCENT_RANK() OVER w_score * 100, 2)     AS `percentile_rank`,
-            NTILE(4) OVER w_score                            AS `quartile`,
-            NTILE(10) OVER w_score                           AS `decile`,
-
-            ROUND(AVG(lb.total_score) OVER (
-                ORDER BY lb.total_score DESC
-                ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-            ), 4)                                            AS running_avg,
-
-            ROUND(AVG(lb.total_score) OVER (), 4)            AS exam_avg,
-            ROUND(STDDEV_POP(lb.total_score) OVER (), 4)     AS exam_stddev,
-
-            ROUND(lb.total_score - AVG(lb.total_score) OVER (), 4) AS deviation,
-
-            ROUND(
-                CASE WHEN STDDEV_POP(lb.total_score) OVER () > 0
-                     THEN (lb.total_score - AVG(lb.total_score) OVER ())
-                          / STDDEV_POP(lb.total_score) OVER ()
-                     ELSE 0
-                END, 4
-            )                                                AS z_score,
-
-            LAG(lb.total_score, 1) OVER w_score              AS prev_score,
-            LEAD(lb.total_score, 1) OVER w_score             AS next_score,
-            ROUND(lb.total_score - LAG(lb.total_score, 1) OVER w_score, 4) AS gap_above,
-            ROUND(lb.total_score - LEAD(lb.total_score, 1) OVER w_score, 4) AS gap_below,
-
-            DENSE_RANK() OVER (ORDER BY lb.weighted_coding DESC)     AS `coding_rank`,
-            DENSE_RANK() OVER (ORDER BY lb.weighted_quiz DESC)       AS `quiz_rank`,
-            DENSE_RANK() OVER (ORDER BY lb.weighted_assessment DESC) AS `assessment_rank`,
-            DENSE_RANK() OVER (ORDER BY lb.total_time_sec ASC)       AS `speed_rank`,
-
-            CASE
-                WHEN PERCENT_RANK() OVER w_score >= 0.90 THEN 'Outstanding'
-                WHEN PERCENT_RANK() OVER w_score >= 0.75 THEN 'Excellent'
-                WHEN PERCENT_RANK() OVER w_score >= 0.50 THEN 'Good'
-                WHEN PERCENT_RANK() OVER w_score >= 0.25 THEN 'Average'
-                ELSE 'Needs Improvement'
-            END                                              AS `performance_tier`,
-
-            COUNT(*) OVER ()                                 AS `total_participants`
-
-        FROM leaderboard_snapshot lb
-        JOIN users u ON lb.user_id = u.user_id
-        WHERE lb.exam_id = :exam_id
-        WINDOW w_score AS (ORDER BY lb.total_score DESC, lb.total_time_sec ASC)
-        ORDER BY lb.total_score DESC, lb.total_time_sec ASC
-        LIMIT :limit OFFSET :offset
-    """)
-
+    page = max(1, args["page"])
+    per_page = min(100, max(1, args["per_page"]))
+
+    after = request.args.get("after")
+    try:
+        cursor = decode_cursor(after) if after else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    # One row of look-behind and one of look-ahead, so gap_above / gap_below
+    # are exact at page boundaries.  With a cursor the look-behind score is
+    # the cursor's own key, so the seek needs no extra row.
+    if cursor:
+        position, lead = cursor.position, 0
+        params = {
+            "c_score": cursor.total_score, "c_time": cursor.total_time_sec,
+            "c_user": cursor.user_id, "offset": 0,
+        }
+    else:
+        position = (page - 1) * per_page
+        lead = 1 if position else 0
+        params = {"offset": position - lead}
+
+    sql = _ANALYTICS_LEADERBOARD_AFTER if cursor else _ANALYTICS_LEADERBOARD_PAGE
     rows = db.session.execute(sql, {
-        "exam_id": exam_id, "limit": per_page, "offset": offset
+        "exam_id": exam_id, "limit": per_page + lead + 1, **params,
     }).mappings().all()
 
-    if not rows:
+    if len(rows) <= lead:
         return jsonify({"error": "No data found for this exam"}), 404
 
-    entries = [dict(r) for r in rows]
-    # Convert Decimal types to float for JSON serialisation
-    for entry in entries:
-        for k, v in entry.items():
-            if hasattr(v, 'quantize'):  # Decimal
-                entry[k] = float(v)
+    rows = _with_refresh_fallbacks(rows, exam_id)
+    prev_score = rows[0]["total_score"] if lead else (cursor.total_score if cursor else None)
+    entries = _with_neighbour_gaps(rows[lead:], per_page, position, prev_score)
+
+    next_cursor = None
+    if len(rows) - lead > per_page:
+        last = entries[-1]
+        next_cursor = encode_cursor(
+            last["total_score"], last["total_time_sec"], last["user_id"], last["row_num"],
+        )
 
     return jsonify({
         "exam_id": exam_id,
@@ -125,6 +168,7 @@ def analytics_leaderboard():
         "per_page": per_page,
         "total_participants": int(entries[0]["total_participants"]) if entries else 0,
         "data": entries,
+        "next_cursor": next_cursor,
     }), 200
 
 
@@ -132,105 +176,96 @@ def analytics_leaderboard():
 # 2. Exam Summary Statistics
 # ────────────────────────────────────────────────────────────────────────────
 
+_SUMMARY_SQL = text("""
+    SELECT
+        lb.exam_id,
+        e.title                                          AS exam_title,
+        COUNT(*)                                         AS total_participants,
+        CAST(ROUND(AVG(lb.total_score), 2) AS DOUBLE)    AS avg_score,
+        CAST(ROUND(STDDEV_POP(lb.total_score), 2) AS DOUBLE) AS stddev_score,
+        CAST(ROUND(MIN(lb.total_score), 2) AS DOUBLE)    AS min_score,
+        CAST(ROUND(MAX(lb.total_score), 2) AS DOUBLE)    AS max_score,
+        CAST(ROUND(MAX(lb.total_score) - MIN(lb.total_score), 2) AS DOUBLE) AS score_range,
+        CAST(ROUND(AVG(lb.weighted_coding), 2) AS DOUBLE)     AS avg_coding,
+        CAST(ROUND(AVG(lb.weighted_quiz), 2) AS DOUBLE)       AS avg_quiz,
+        CAST(ROUND(AVG(lb.weighted_assessment), 2) AS DOUBLE) AS avg_assessment,
+        CAST(ROUND(MAX(lb.weighted_coding), 2) AS DOUBLE)     AS max_coding,
+        CAST(ROUND(MAX(lb.weighted_quiz), 2) AS DOUBLE)       AS max_quiz,
+        CAST(ROUND(MAX(lb.weighted_assessment), 2) AS DOUBLE) AS max_assessment,
+        CAST(ROUND(AVG(lb.total_time_sec), 0) AS DOUBLE) AS avg_time_sec,
+        MIN(lb.total_time_sec)                           AS fastest_time_sec,
+        MAX(lb.total_time_sec)                           AS slowest_time_sec,
+        CAST(ROUND(
+            SUM(CASE WHEN lb.total_score >= 40 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+        ) AS DOUBLE)                                     AS pass_rate_pct,
+        CAST(ROUND(
+            SUM(CASE WHEN lb.total_score >= 75 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+        ) AS DOUBLE)                                     AS distinction_rate_pct
+    FROM leaderboard_snapshot lb
+    JOIN exams e ON lb.exam_id = e.exam_id
+    WHERE lb.exam_id = :exam_id
+    GROUP BY lb.exam_id, e.title
+""")
+
+
 @analytics_bp.route("/analytics/summary", methods=["GET"])
-@cache.cached(timeout=15, query_string=True)
+@cache.cached(timeout=_CACHE_TTL_SEC, make_cache_key=lambda **_: _versioned_cache_key())
 def analytics_summary():
     """Aggregated exam-level statistics."""
 
-    exam_id = request.args.get("exam_id", type=int)
+    exam_id = _args_ints("exam_id")["exam_id"]
     if exam_id is None:
         return jsonify({"error": "exam_id is required"}), 400
 
-    sql = text("""
-        SELECT
-            lb.exam_id,
-            e.title                                          AS exam_title,
-            COUNT(*)                                         AS total_participants,
-            ROUND(AVG(lb.total_score), 2)                    AS avg_score,
-            ROUND(STDDEV_POP(lb.total_score), 2)             AS stddev_score,
-            ROUND(MIN(lb.total_score), 2)                    AS min_score,
-            ROUND(MAX(lb.total_score), 2)                    AS max_score,
-            ROUND(MAX(lb.total_score) - MIN(lb.total_score), 2) AS score_range,
-            ROUND(AVG(lb.weighted_coding), 2)                AS avg_coding,
-            ROUND(AVG(lb.weighted_quiz), 2)                  AS avg_quiz,
-            ROUND(AVG(lb.weighted_assessment), 2)            AS avg_assessment,
-            ROUND(MAX(lb.weighted_coding), 2)                AS max_coding,
-            ROUND(MAX(lb.weighted_quiz), 2)                  AS max_quiz,
-            ROUND(MAX(lb.weighted_assessment), 2)            AS max_assessment,
-            ROUND(AVG(lb.total_time_sec), 0)                 AS avg_time_sec,
-            MIN(lb.total_time_sec)                           AS fastest_time_sec,
-            MAX(lb.total_time_sec)                           AS slowest_time_sec,
-            ROUND(
-                SUM(CASE WHEN lb.total_score >= 40 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
-            )                                                AS pass_rate_pct,
-            ROUND(
-                SUM(CASE WHEN lb.total_score >= 75 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
-            )                                                AS distinction_rate_pct
-        FROM leaderboard_snapshot lb
-        JOIN exams e ON lb.exam_id = e.exam_id
-        WHERE lb.exam_id = :exam_id
-        GROUP BY lb.exam_id, e.title
-    """)
-
-    row = db.session.execute(sql, {"exam_id": exam_id}).mappings().one_or_none()
+    row = db.session.execute(_SUMMARY_SQL, {"exam_id": exam_id}).mappings().one_or_none()
 
     if row is None:
         return jsonify({"error": "No data found"}), 404
 
-    result = dict(row)
-    for k, v in result.items():
-        if hasattr(v, 'quantize'):
-            result[k] = float(v)
-
-    return jsonify(result), 200
+    return jsonify(dict(row)), 200
 
 
 # ────────────────────────────────────────────────────────────────────────────
 # 3. Score Distribution — Histogram Buckets
 # ────────────────────────────────────────────────────────────────────────────
 
+_DISTRIBUTION_SQL = text("""
+    SELECT
+        CASE
+            WHEN lb.total_score >= 90 THEN '90-100'
+            WHEN lb.total_score >= 80 THEN '80-89'
+            WHEN lb.total_score >= 70 THEN '70-79'
+            WHEN lb.total_score >= 60 THEN '60-69'
+            WHEN lb.total_score >= 50 THEN '50-59'
+            WHEN lb.total_score >= 40 THEN '40-49'
+            WHEN lb.total_score >= 30 THEN '30-39'
+            ELSE 'Below 30'
+        END AS score_bucket,
+        COUNT(*) AS student_count,
+        CAST(ROUND(
+            COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2
+        ) AS DOUBLE) AS pct_of_total,
+        CAST(ROUND(AVG(lb.total_score), 2) AS DOUBLE) AS avg_in_bucket,
+        CAST(ROUND(AVG(lb.total_time_sec), 0) AS DOUBLE) AS avg_time_in_bucket
+    FROM leaderboard_snapshot lb
+    WHERE lb.exam_id = :exam_id
+    GROUP BY score_bucket
+    ORDER BY MIN(lb.total_score) DESC
+""")
+
+
 @analytics_bp.route("/analytics/distribution", methods=["GET"])
-@cache.cached(timeout=15, query_string=True)
+@cache.cached(timeout=_CACHE_TTL_SEC, make_cache_key=lambda **_: _versioned_cache_key())
 def analytics_distribution():
     """Score distribution grouped into 10-point buckets."""
 
-    exam_id = request.args.get("exam_id", type=int)
+    exam_id = _args_ints("exam_id")["exam_id"]
     if exam_id is None:
         return jsonify({"error": "exam_id is required"}), 400
 
-    sql = text("""
-        SELECT
-            CASE
-                WHEN lb.total_score >= 90 THEN '90-100'
-                WHEN lb.total_score >= 80 THEN '80-89'
-                WHEN lb.total_score >= 70 THEN '70-79'
-                WHEN lb.total_score >= 60 THEN '60-69'
-                WHEN lb.total_score >= 50 THEN '50-59'
-                WHEN lb.total_score >= 40 THEN '40-49'
-                WHEN lb.total_score >= 30 THEN '30-39'
-                ELSE 'Below 30'
-            END AS score_bucket,
-            COUNT(*) AS student_count,
-            ROUND(
-                COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2
-            ) AS pct_of_total,
-            ROUND(AVG(lb.total_score), 2) AS avg_in_bucket,
-            ROUND(AVG(lb.total_time_sec), 0) AS avg_time_in_bucket
-        FROM leaderboard_snapshot lb
-        WHERE lb.exam_id = :exam_id
-        GROUP BY score_bucket
-        ORDER BY MIN(lb.total_score) DESC
-    """)
-
-    rows = db.session.execute(sql, {"exam_id": exam_id}).mappings().all()
-
-    buckets = []
-    for r in rows:
-        d = dict(r)
-        for k, v in d.items():
-            if hasattr(v, 'quantize'):
-                d[k] = float(v)
-        buckets.append(d)
+    rows = db.session.execute(_DISTRIBUTION_SQL, {"exam_id": exam_id}).mappings().all()
+
+    buckets = [dict(r) for r in rows]
 
     return jsonify({"exam_id": exam_id, "distribution": buckets}), 200
 
@@ -239,179 +274,368 @@ def analytics_distribution():
 # 4. Module Comparative Analysis
 # ────────────────────────────────────────────────────────────────────────────
 
-@analytics_bp.route("/analytics/modules", methods=["GET"])
-@cache.cached(timeout=15, query_string=True)
-def analytics_modules():
-    """Per-student module-wise analysis: strongest/weakest module, efficiency."""
-
-    exam_id = request.args.get("exam_id", type=int)
-    if exam_id is None:
-        return jsonify({"error": "exam_id is required"}), 400
-
-    sort_by = request.args.get("sort", "points_per_minute")
-    allowed_sorts = {"points_per_minute", "coding_raw", "quiz_raw", "assessment_raw", "cross_module_stddev"}
-    if sort_by not in allowed_sorts:
-        sort_by = "points_per_minute"
-
-    sql = text(f"""
+# Each module's MAX(CASE …) is computed once per user in the CTE; the
+# strongest / weakest comparisons then reuse the named columns.
+_MODULES_SQL = """
+    WITH per_user AS (
         SELECT
             u.user_id,
             u.username,
             u.full_name,
 
-            MAX(CASE WHEN ms.module_type = 'coding'     THEN ms.raw_score END)  AS coding_raw,
-            MAX(CASE WHEN ms.module_type = 'quiz'       THEN ms.raw_score END)  AS quiz_raw,
-            MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END)  AS assessment_raw,
-
-            MAX(CASE WHEN ms.module_type = 'coding'     THEN ms.time_spent_sec END)  AS coding_time,
-            MAX(CASE WHEN ms.module_type = 'quiz'       THEN ms.time_spent_sec END)  AS quiz_time,
-            MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.time_spent_sec END)  AS assessment_time,
-
-            CASE
-                WHEN MAX(CASE WHEN ms.module_type = 'coding' THEN ms.raw_score END) >=
-                     MAX(CASE WHEN ms.module_type = 'quiz' THEN ms.raw_score END)
-                 AND MAX(CASE WHEN ms.module_type = 'coding' THEN ms.raw_score END) >=
-                     MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END)
-                THEN 'Coding'
-                WHEN MAX(CASE WHEN ms.module_type = 'quiz' THEN ms.raw_score END) >=
-                     MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END)
-                THEN 'Quiz'
-                ELSE 'Assessment'
-            END AS strongest_module,
-
-            CASE
-                WHEN MAX(CASE WHEN ms.module_type = 'coding' THEN ms.raw_score END) <=
-                     MAX(CASE WHEN ms.module_type = 'quiz' THEN ms.raw_score END)
-                 AND MAX(CASE WHEN ms.module_type = 'coding' THEN ms.raw_score END) <=
-                     MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END)
-                THEN 'Coding'
-                WHEN MAX(CASE WHEN ms.module_type = 'quiz' THEN ms.raw_score END) <=
-                     MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END)
-                THEN 'Quiz'
-                ELSE 'Assessment'
-            END AS weakest_module,
-
-            ROUND(STDDEV_POP(ms.raw_score), 2) AS cross_module_stddev,
-
-            ROUND(
-                SUM(ms.raw_score) / NULLIF(SUM(ms.time_spent_sec) / 60.0, 0), 4
-            ) AS points_per_minute
+            MAX(CASE WHEN ms.module_type = 'coding'     THEN ms.raw_score END) AS coding_raw,
+            MAX(CASE WHEN ms.module_type = 'quiz'       THEN ms.raw_score END) AS quiz_raw,
+            MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.raw_score END) AS assessment_raw,
+
+            MAX(CASE WHEN ms.module_type = 'coding'     THEN ms.time_spent_sec END) AS coding_time,
+            MAX(CASE WHEN ms.module_type = 'quiz'       THEN ms.time_spent_sec END) AS quiz_time,
+            MAX(CASE WHEN ms.module_type = 'assessment' THEN ms.time_spent_sec END) AS assessment_time,
+
+            STDDEV_POP(ms.raw_score)                                  AS raw_stddev,
+            SUM(ms.raw_score) / NULLIF(SUM(ms.time_spent_sec) / 60.0, 0) AS raw_ppm
 
         FROM exam_sessions es
         JOIN users u ON es.user_id = u.user_id
         JOIN module_scores ms ON es.session_id = ms.session_id
         WHERE es.exam_id = :exam_id
         GROUP BY u.user_id, u.username, u.full_name
-        ORDER BY {sort_by} DESC
-    """)
+    )
+    SELECT
+        user_id,
+        username,
+        full_name,
+
+        CAST(coding_raw AS DOUBLE)     AS coding_raw,
+        CAST(quiz_raw AS DOUBLE)       AS quiz_raw,
+        CAST(assessment_raw AS DOUBLE) AS assessment_raw,
+
+        coding_time,
+        quiz_time,
+        assessment_time,
+
+        CASE
+            WHEN coding_raw >= quiz_raw AND coding_raw >= assessment_raw THEN 'Coding'
+            WHEN quiz_raw >= assessment_raw                               THEN 'Quiz'
+            ELSE 'Assessment'
+        END AS strongest_module,
+
+        CASE
+            WHEN coding_raw <= quiz_raw AND coding_raw <= assessment_raw THEN 'Coding'
+            WHEN quiz_raw <= assessment_raw                               THEN 'Quiz'
+            ELSE 'Assessment'
+        END AS weakest_module,
+
+        CAST(ROUND(raw_stddev, 2) AS DOUBLE) AS cross_module_stddev,
+        CAST(ROUND(raw_ppm, 4) AS DOUBLE)    AS points_per_minute
+
+    FROM per_user
+    ORDER BY {sort_by} DESC
+"""
+
+# Rows fetched per round-trip from the server-side cursor when streaming
+_STREAM_BATCH_ROWS = 500
+
+# A streamed body is kept for the cache only up to this size; larger ones
+# are streamed on every request rather than held in memory.
+_STREAM_CACHE_MAX_BYTES = 4 * 1024 * 1024
+
+_EXAM_EXISTS_SQL = text("SELECT 1 FROM exams WHERE exam_id = :exam_id")
+
+# One pre-built statement per allowed `sort` value — the ORDER BY column is
+# never taken from the request string itself.
+_MODULES_SQL_BY_SORT = {
+    sort_by: text(_MODULES_SQL.format(sort_by=sort_by))
+    for sort_by in (
+        "points_per_minute", "coding_raw", "quiz_raw", "assessment_raw", "cross_module_stddev",
+    )
+}
+
+
+@analytics_bp.route("/analytics/modules", methods=["GET"])
+def analytics_modules():
+    """
+    Per-student module-wise analysis: strongest/weakest module, efficiency.
+
+    Returns one row per participant, unpaged, so the body is streamed: rows
+    come off a server-side cursor in batches and are encoded one at a time
+    instead of building the full list and its JSON buffer in memory.
+    @cache.cached cannot store a stream, so _caching_stream stores the body
+    as it is sent, under the same versioned key as the other endpoints.
+    """
+
+    exam_id = _args_ints("exam_id")["exam_id"]
+    if exam_id is None:
+        return jsonify({"error": "exam_id is required"}), 400
+
+    cache_key = _versioned_cache_key()
+    body = cache.get(cache_key)
+    if body is not None:
+        return Response(body, status=200, mimetype="application/json")
+
+    # Checked up front: a streamed response has sent its 200 before the
+    # first row is read.
+    if db.session.execute(_EXAM_EXISTS_SQL, {"exam_id": exam_id}).first() is None:
+        return jsonify({"error": "Exam not found"}), 404
+
+    sql = _MODULES_SQL_BY_SORT.get(
+        request.args.get("sort"), _MODULES_SQL_BY_SORT["points_per_minute"]
+    )
 
-    rows = db.session.execute(sql, {"exam_id": exam_id}).mappings().all()
+    def generate():
+        rows = db.session.execute(
+            sql, {"exam_id": exam_id},
+            execution_options={"stream_results": True, "yield_per": _STREAM_BATCH_ROWS},
+        ).mappings()
 
-    data = []
-    for r in rows:
-        d = dict(r)
-        for k, v in d.items():
-            if hasattr(v, 'quantize'):
-                d[k] = float(v)
-        data.append(d)
+        yield b'{"exam_id":' + json_provider.dumps(exam_id) + b',"data":['
+        separator = b""
+        for row in rows:
+            yield separator + json_provider.dumps(dict(row))
+            separator = b","
+        yield b"]}"
 
-    return jsonify({"exam_id": exam_id, "data": data}), 200
+    return Response(
+        stream_with_context(_caching_stream(generate(), cache_key)),
+        status=200, mimetype="application/json",
+    )
 
 
 # ────────────────────────────────────────────────────────────────────────────
 # 5. Individual Student Deep-Dive
 # ────────────────────────────────────────────────────────────────────────────
 
+# One snapshot row by (exam_id, user_id) plus one index seek on each side
+# for the neighbouring scores, in (score DESC, time ASC, user_id ASC) order.
+_STUDENT_SQL = text("""
+    SELECT
+        u.user_id,
+        u.username,
+        u.full_name,
+        CAST(lb.weighted_coding AS DOUBLE)               AS weighted_coding,
+        CAST(lb.weighted_quiz AS DOUBLE)                 AS weighted_quiz,
+        CAST(lb.weighted_assessment AS DOUBLE)           AS weighted_assessment,
+        CAST(lb.total_score AS DOUBLE)                   AS total_score,
+        lb.total_time_sec,
+
+        lb.rank_position                                 AS `dense_rank`,
+        lb.standard_rank                                 AS `standard_rank`,
+        CAST(lb.percentile_rank AS DOUBLE)               AS `percentile_rank`,
+        lb.quartile                                      AS `quartile`,
+
+        CAST(st.avg_score AS DOUBLE)                     AS exam_avg,
+        CAST(st.stddev_score AS DOUBLE)                  AS exam_stddev,
+        st.participant_count                             AS total_participants,
+
+        CAST(lb.z_score AS DOUBLE)                       AS z_score,
+
+        (SELECT CAST(a.total_score AS DOUBLE)
+         FROM leaderboard_snapshot a
+         WHERE a.exam_id = lb.exam_id
+           AND (a.total_score > lb.total_score
+                OR (a.total_score = lb.total_score AND a.total_time_sec < lb.total_time_sec)
+                OR (a.total_score = lb.total_score AND a.total_time_sec = lb.total_time_sec
+                    AND a.user_id < lb.user_id))
+         ORDER BY a.total_score ASC, a.total_time_sec DESC, a.user_id DESC
+         LIMIT 1)                                        AS score_above,
+
+        (SELECT CAST(b.total_score AS DOUBLE)
+         FROM leaderboard_snapshot b
+         WHERE b.exam_id = lb.exam_id
+           AND (b.total_score < lb.total_score
+                OR (b.total_score = lb.total_score AND b.total_time_sec > lb.total_time_sec)
+                OR (b.total_score = lb.total_score AND b.total_time_sec = lb.total_time_sec
+                    AND b.user_id > lb.user_id))
+         ORDER BY b.total_score DESC, b.total_time_sec ASC, b.user_id ASC
+         LIMIT 1)                                        AS score_below,
+
+        lb.coding_rank                                   AS `coding_rank`,
+        lb.quiz_rank                                     AS `quiz_rank`,
+        lb.assessment_rank                               AS `assessment_rank`,
+        lb.speed_rank                                    AS `speed_rank`,
+
+        lb.performance_tier                              AS `performance_tier`
+
+    FROM leaderboard_snapshot lb
+    JOIN users u ON lb.user_id = u.user_id
+    LEFT JOIN exam_stats st ON st.exam_id = lb.exam_id
+    WHERE lb.exam_id = :exam_id AND lb.user_id = :user_id
+""")
+
+
+_STUDENT_MODULES_SQL = text("""
+    SELECT ms.module_type,
+           CAST(ms.raw_score AS DOUBLE) AS raw_score,
+           CAST(ms.max_score AS DOUBLE) AS max_score,
+           ms.time_spent_sec, ms.details
+    FROM module_scores ms
+    JOIN exam_sessions es ON ms.session_id = es.session_id
+    WHERE es.exam_id = :exam_id AND es.user_id = :user_id
+""")
+
+
 @analytics_bp.route("/analytics/student/<int:user_id>", methods=["GET"])
 def analytics_student(user_id: int):
     """
     Complete analytical profile for a single student:
     rank, percentile, z-score, module breakdown, comparison to peers.
+    Like the leaderboard, reads the columns materialised by the rank
+    refresh; only the neighbouring scores are looked up, by index seek.
     """
 
-    exam_id = request.args.get("exam_id", type=int)
+    exam_id = _args_ints("exam_id")["exam_id"]
     if exam_id is None:
         return jsonify({"error": "exam_id is required"}), 400
 
     # Get analytics row for this student
-    sql = text("""
-        WITH ranked AS (
-            SELECT
-                u.user_id,
-                u.username,
-                u.full_name,
-                lb.weighted_coding,
-                lb.weighted_quiz,
-                lb.weighted_assessment,
-                lb.total_score,
-                lb.total_time_sec,
-
-                DENSE_RANK() OVER w_score                    AS `dense_rank`,
-                ROUND(PERCENT_RANK() OVER w_score * 100, 2) AS `percentile_rank`,
-                NTILE(4) OVER w_score                        AS `quartile`,
-
-                ROUND(AVG(lb.total_score) OVER (), 4)        AS exam_avg,
-                ROUND(STDDEV_POP(lb.total_score) OVER (), 4) AS exam_stddev,
-                COUNT(*) OVER ()                             AS total_participants,
-
-                ROUND(
-                    CASE WHEN STDDEV_POP(lb.total_score) OVER () > 0
-                         THEN (lb.total_score - AVG(lb.total_score) OVER ())
-                              / STDDEV_POP(lb.total_score) OVER ()
-                         ELSE 0
-                    END, 4
-                )                                            AS z_score,
-
-                LAG(lb.total_score, 1) OVER w_score          AS score_above,
-                LEAD(lb.total_score, 1) OVER w_score         AS score_below,
-
-                DENSE_RANK() OVER (ORDER BY lb.weighted_coding DESC)     AS `coding_rank`,
-                DENSE_RANK() OVER (ORDER BY lb.weighted_quiz DESC)       AS `quiz_rank`,
-                DENSE_RANK() OVER (ORDER BY lb.weighted_assessment DESC) AS `assessment_rank`,
-                DENSE_RANK() OVER (ORDER BY lb.total_time_sec ASC)       AS `speed_rank`,
-
-                CASE
-                    WHEN PERCENT_RANK() OVER w_score >= 0.90 THEN 'Outstanding'
-                    WHEN PERCENT_RANK() OVER w_score >= 0.75 THEN 'Excellent'
-                    WHEN PERCENT_RANK() OVER w_score >= 0.50 THEN 'Good'
-                    WHEN PERCENT_RANK() OVER w_score >= 0.25 THEN 'Average'
-                    ELSE 'Needs Improvement'
-                END AS performance_tier
-
-            FROM leaderboard_snapshot lb
-            JOIN users u ON lb.user_id = u.user_id
-            WHERE lb.exam_id = :exam_id
-            WINDOW w_score AS (ORDER BY lb.total_score DESC, lb.total_time_sec ASC)
-        )
-        SELECT * FROM ranked WHERE user_id = :user_id
-    """)
-
-    row = db.session.execute(sql, {"exam_id": exam_id, "user_id": user_id}).mappings().one_or_none()
+    row = db.session.execute(_STUDENT_SQL, {"exam_id": exam_id, "user_id": user_id}).mappings().one_or_none()
 
     if row is None:
         return jsonify({"error": "Student not found in this exam"}), 404
 
-    result = dict(row)
-    for k, v in result.items():
-        if hasattr(v, 'quantize'):
-            result[k] = float(v)
+    result = _with_refresh_fallbacks([row], exam_id)[0]
 
     # Fetch module details
-    module_sql = text("""
-        SELECT ms.module_type, ms.raw_score, ms.max_score,
-               ms.time_spent_sec, ms.details
-        FROM module_scores ms
-        JOIN exam_sessions es ON ms.session_id = es.session_id
-        WHERE es.exam_id = :exam_id AND es.user_id = :user_id
-    """)
-    modules = db.session.execute(module_sql, {"exam_id": exam_id, "user_id": user_id}).mappings().all()
-
-    result["modules"] = []
-    for m in modules:
-        md = dict(m)
-        for k, v in md.items():
-            if hasattr(v, 'quantize'):
-                md[k] = float(v)
-        result["modules"].append(md)
+    modules = db.session.execute(_STUDENT_MODULES_SQL, {"exam_id": exam_id, "user_id": user_id}).mappings().all()
+
+    result["modules"] = [dict(m) for m in modules]
 
     return jsonify(result), 200
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Helpers
+# ────────────────────────────────────────────────────────────────────────────
+
+# Per-row analytics written only by _refresh_ranks; until then a new
+# snapshot row holds their column defaults (rank_position is set inline).
+_REFRESHED_COLUMNS = frozenset({
+    "standard_rank", "percentile_rank", "quartile", "decile", "running_avg",
+    "z_score", "coding_rank", "quiz_rank", "assessment_rank", "speed_rank",
+    "performance_tier",
+})
+
+# exam_stats' aggregates, computed live for an exam that has no row yet
+_EXAM_STATS_FALLBACK_SQL = text("""
+    SELECT CAST(ROUND(AVG(total_score), 4) AS DOUBLE)        AS exam_avg,
+           CAST(ROUND(STDDEV_POP(total_score), 4) AS DOUBLE) AS exam_stddev,
+           COUNT(*)                                          AS total_participants
+    FROM leaderboard_snapshot
+    WHERE exam_id = :exam_id
+""")
+
+
+def _args_ints(*names: str, defaults: dict | None = None) -> dict[str, int | None]:
+    """
+    Read the named query params as ints from one snapshot of request.args.
+    Missing or non-integer values fall back to `defaults` (else None), like
+    `request.args.get(name, default, type=int)`.
+    """
+    args = request.args.to_dict()
+    defaults = defaults or {}
+    values = {}
+    for name in names:
+        try:
+            values[name] = int(args[name])
+        except (KeyError, ValueError):
+            values[name] = defaults.get(name)
+    return values
+
+
+def _with_refresh_fallbacks(rows, exam_id: int) -> list[dict]:
+    """
+    `rows` as dicts, patched where the rank refresh has not caught up:
+
+    • no exam_stats row yet (the LEFT JOIN gave NULLs) — the exam-wide
+      aggregates are computed from leaderboard_snapshot instead;
+    • rows inserted since the last refresh (standard_rank is still its
+      default 0; a refreshed rank is never below 1) — their per-row
+      analytics are reported as null rather than as the column defaults.
+
+    Either case queues a rank refresh, whose new cache version then
+    replaces any response built from these rows.
+    """
+    entries = [dict(r) for r in rows]
+    stats_missing = entries[0]["total_participants"] is None
+    pending = [e for e in entries if e["standard_rank"] == 0]
+    if not stats_missing and not pending:
+        return entries
+
+    rank_tasks.schedule_rank_refresh(exam_id)
+
+    if stats_missing:
+        stats = db.session.execute(_EXAM_STATS_FALLBACK_SQL, {"exam_id": exam_id}).mappings().one()
+        for entry in entries:
+            entry.update(stats)
+            if "deviation" in entry:
+                entry["deviation"] = round(entry["total_score"] - stats["exam_avg"], 4)
+
+    for entry in pending:
+        for column in _REFRESHED_COLUMNS.intersection(entry):
+            entry[column] = None
+
+    return entries
+
+
+def _caching_stream(chunks, cache_key: str):
+    """
+    Pass `chunks` through and, once the stream completes, store the joined
+    body under `cache_key` — unless it outgrew _STREAM_CACHE_MAX_BYTES.  A
+    client that disconnects mid-stream leaves nothing cached.
+    """
+    kept, size = [], 0
+    for chunk in chunks:
+        yield chunk
+        if kept is None:
+            continue
+        size += len(chunk)
+        if size > _STREAM_CACHE_MAX_BYTES:
+            kept = None
+        else:
+            kept.append(chunk)
+
+    if kept is not None:
+        cache.set(cache_key, b"".join(kept), timeout=_CACHE_TTL_SEC)
+
+
+def _versioned_cache_key() -> str:
+    """
+    Response cache key: path + sorted query string under the exam's current
+    leaderboard version token.  The rank refresh replaces that token after
+    rewriting the materialised analytics columns, so readers move to fresh
+    keys instead of all missing on one deleted key mid-rebuild.
+    """
+    exam_id = _args_ints("exam_id")["exam_id"]
+    version = _leaderboard_cache_version(exam_id) if exam_id is not None else 0
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return f"analytics:exam:{exam_id}:v{version}:{request.path}?{query}"
+
+
+def _with_neighbour_gaps(
+    rows, per_page: int, position: int, before: float | None,
+) -> list[dict]:
+    """
+    Build the page entries from `rows` (the page plus, possibly, one
+    look-ahead row), attaching row_num and the previous / next scores and
+    gaps that LAG / LEAD used to provide.  `before` is the score of the row
+    preceding the page, or None on the first page.
+    """
+    page = rows[:per_page]
+    scores = [r["total_score"] for r in rows]
+    # Neighbour sequences aligned with the page: shift the score column one
+    # row each way, padding with the look-behind score / None at the edges.
+    prevs = [before, *scores[:len(page) - 1]]
+    nexts = scores[1:len(page) + 1] + [None] * (len(page) + 1 - len(scores))
+
+    entries = []
+    for row_num, row, score, prev_score, next_score in zip(
+        range(position + 1, position + len(page) + 1), page, scores, prevs, nexts,
+    ):
+        entry = dict(row)
+        entry["row_num"] = row_num
+        entry["prev_score"] = prev_score
+        entry["next_score"] = next_score
+        entry["gap_above"] = round(score - prev_score, 4) if prev_score is not None else None
+        entry["gap_below"] = round(score - next_score, 4) if next_score is not None else None
+        entries.append(entry)
+
+    return entries
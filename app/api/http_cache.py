@@ -0,0 +1,60 @@
+"""
+HTTP caching headers for the read-only GET endpoints.
+
+Responses get a content-hash ETag and a short `Cache-Control: max-age`
+matching the server-side cache TTL, so a client that revalidates with
+`If-None-Match` receives an empty 304 instead of the full JSON body.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+from flask import Response, current_app, request
+
+
+def etag_of(*chunks: bytes) -> str:
+    """Strong content hash of the given body chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def conditional(response: Response, private: bool = False) -> Response:
+    """
+    Add ETag / Cache-Control to a 200 JSON response and turn it into a 304
+    when the request's If-None-Match matches.
+
+    An ETag already set by the view (e.g. one that ignores per-request
+    fields like `cached`) is kept; otherwise the body is hashed.  Streamed
+    responses are returned untouched — hashing would buffer them.
+    """
+    if request.method != "GET" or response.status_code != 200 or response.is_streamed:
+        return response
+
+    if "ETag" not in response.headers:
+        response.set_etag(etag_of(response.get_data()))
+
+    max_age = current_app.config.get("CACHE_DEFAULT_TIMEOUT", 5)
+    response.headers["Cache-Control"] = f"{'private' if private else 'public'}, max-age={max_age}"
+
+    # Flask-Compress suffixes the ETag of a compressed body (":br", ":gzip"),
+    # so compare the client's tags with any such suffix stripped.
+    etag, weak = response.get_etag()
+    if request.if_none_match.star_tag:
+        return _not_modified(response, etag, weak)
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if tag.split(":", 1)[0] == etag:
+            return _not_modified(response, tag, weak)
+
+    return response
+
+
+def _not_modified(response: Response, etag: str, weak: bool) -> Response:
+    """Empty 304 echoing the client's validator and our caching headers."""
+    not_modified = Response(status=304)
+    not_modified.set_etag(etag, weak=weak)
+    not_modified.headers["Cache-Control"] = response.headers["Cache-Control"]
+    not_modified.vary.add("Accept-Encoding")
+    return not_modified
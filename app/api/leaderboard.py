@@ -2,25 +2,49 @@
 GET /api/v1/leaderboard?exam_id=<id>&page=1&per_page=50
 
 Returns the sorted leaderboard for a given exam.
-- Sorted by total_score DESC, total_time_sec ASC (tie-breaker).
-- Redis-cached with short TTL (configurable, default 5s).
-- Supports pagination.
+- Sorted by total_score DESC, total_time_sec ASC (tie-breaker), user_id ASC.
+- Served from a Redis sorted set maintained by the scoring engine, with
+  MySQL as fallback; pages are also cached as serialised JSON bytes with a
+  short, jittered TTL (default 5s) and rebuilt by one request at a time.
+- Supports keyset pagination via `after=<next_cursor>`; `page` is kept as
+  an OFFSET fallback.
+- Sends an ETag and Cache-Control; `If-None-Match` revalidation gets a 304.
 """
 
 from __future__ import annotations
 
-import json
 import logging
+import random
+import time
 
-from flask import Blueprint, request, jsonify, current_app
-from sqlalchemy import select, func
+from flask import Blueprint, Response, request, jsonify, current_app
+from marshmallow import ValidationError
+from sqlalchemy import Integer, bindparam, select, and_, or_
 
+from app import json_provider
+from app.api.http_cache import conditional, etag_of
+from app.api.pagination import Cursor, decode_cursor, encode_cursor
 from app.extensions import db, cache
-from app.models import LeaderboardSnapshot, User, Exam
+from app.schemas import GetLeaderboardArgsSchema
+from app.models import LeaderboardSnapshot, User, Exam, ExamStats
+from app.services import leaderboard_store
+from app.services.leaderboard_store import ENTRY_COLUMNS, entry_from_row
+from app.services.scoring_engine import (
+    recalculate_all_ranks,
+    _invalidate_leaderboard_cache,
+    _leaderboard_cache_version,
+)
 
 leaderboard_bp = Blueprint("leaderboard", __name__)
 logger = logging.getLogger(__name__)
 
+# Cached page windows are sized to the smallest bucket ≥ per_page
+_PER_PAGE_BUCKETS = (25, 50, 100, 200)
+_LOCK_TIMEOUT_SEC = 3
+_LOCK_POLL_SEC = 0.02
+
+_args_schema = GetLeaderboardArgsSchema()
+
 
 @leaderboard_bp.route("/leaderboard", methods=["GET"])
 def get_leaderboard():
@@ -29,7 +53,8 @@ def get_leaderboard():
 
     Query params:
       - exam_id   (required) : int
-      - page      (optional) : int, default 1
+      - after     (optional) : str — `next_cursor` from the previous page
+      - page      (optional) : int, default 1 (ignored when `after` is set)
       - per_page  (optional) : int, default 50, max 200
       - user_id   (optional) : int — if provided, also returns that user's entry
 
@@ -41,101 +66,56 @@ def get_leaderboard():
       "page": 1,
       "per_page": 50,
       "leaderboard": [ … ],
+      "next_cursor": "…" | null,
       "my_entry": { … } | null,
       "cached": true
     }
     """
 
     # ── Parse & validate query params ──────────────────────────────────
-    exam_id = request.args.get("exam_id", type=int)
-    if exam_id is None:
-        return jsonify({"error": "exam_id query parameter is required"}), 400
-
-    page = max(1, request.args.get("page", 1, type=int))
-    per_page = min(200, max(1, request.args.get("per_page", 50, type=int)))
-    requesting_user_id = request.args.get("user_id", type=int)
-
-    # ── Try cache first ────────────────────────────────────────────────
-    cache_key = f"leaderboard:exam:{exam_id}:p{page}:pp{per_page}"
-    cached_data = cache.get(cache_key)
-
-    if cached_data is not None:
-        result = json.loads(cached_data)
-        result["cached"] = True
-
-        # Append requesting user's row if not on this page
-        if requesting_user_id:
-            result["my_entry"] = _get_user_entry(exam_id, requesting_user_id)
-
-        return jsonify(result), 200
-
-    # ── Cache miss → query database ────────────────────────────────────
-    exam = db.session.get(Exam, exam_id)
-    if exam is None:
+    try:
+        args = _args_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify({"errors": err.messages}), 400
+
+    exam_id = args["exam_id"]
+    page = args["page"]
+    per_page = args["per_page"]
+    requesting_user_id = args["user_id"]
+    after = args["after"]
+
+    try:
+        cursor = decode_cursor(after) if after else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    version = _leaderboard_cache_version(exam_id)
+    position = cursor.position if cursor else (page - 1) * per_page
+
+    # ── Serialised page body: a hit is sent as stored bytes ────────────
+    body, cached = _get_page_body(exam_id, version, page, per_page, position, cursor, after)
+    if body is None:
         return jsonify({"error": f"Exam {exam_id} not found"}), 404
 
-    # Total participants
-    total_count = db.session.execute(
-        select(func.count())
-        .select_from(LeaderboardSnapshot)
-        .where(LeaderboardSnapshot.exam_id == exam_id)
-    ).scalar()
-
-    # Paginated, sorted query
-    offset = (page - 1) * per_page
-
-    rows = db.session.execute(
-        select(
-            LeaderboardSnapshot,
-            User.username,
-            User.full_name,
-        )
-        .join(User, LeaderboardSnapshot.user_id == User.user_id)
-        .where(LeaderboardSnapshot.exam_id == exam_id)
-        .order_by(
-            LeaderboardSnapshot.total_score.desc(),
-            LeaderboardSnapshot.total_time_sec.asc(),
-        )
-        .offset(offset)
-        .limit(per_page)
-    ).all()
-
-    entries = []
-    for lb, username, full_name in rows:
-        entries.append({
-            "rank": lb.rank_position,
-            "user_id": lb.user_id,
-            "username": username,
-            "full_name": full_name,
-            "total_score": float(lb.total_score),
-            "weighted_coding": float(lb.weighted_coding),
-            "weighted_quiz": float(lb.weighted_quiz),
-            "weighted_assessment": float(lb.weighted_assessment),
-            "total_time_sec": lb.total_time_sec,
-            "last_calculated_at": lb.last_calculated_at.isoformat(),
-        })
-
-    result = {
-        "exam_id": exam_id,
-        "exam_title": exam.title,
-        "total_participants": total_count,
-        "page": page,
-        "per_page": per_page,
-        "leaderboard": entries,
-        "cached": False,
-    }
-
-    # ── Store in cache ─────────────────────────────────────────────────
-    ttl = current_app.config.get("CACHE_DEFAULT_TIMEOUT", 5)
-    cache.set(cache_key, json.dumps(result, default=str), timeout=ttl)
-
-    # Append requesting user's entry
-    if requesting_user_id:
-        result["my_entry"] = _get_user_entry(exam_id, requesting_user_id)
-    else:
-        result["my_entry"] = None
-
-    return jsonify(result), 200
+    # ── Splice per-request fields into the stored body ─────────────────
+    # `body` is a JSON object, so its closing brace is replaced by the
+    # trailing fields instead of decoding and re-encoding the page.
+    my_entry = (
+        _get_user_entry_json(exam_id, requesting_user_id, version)
+        if requesting_user_id else b"null"
+    )
+    payload = b"".join((
+        body[:-1],
+        b',"cached":', b"true" if cached else b"false",
+        b',"my_entry":', my_entry,
+        b"}",
+    ))
+
+    response = Response(payload, status=200, mimetype="application/json")
+    response.headers["X-Cache"] = "HIT" if cached else "MISS"
+    # Weak: the hash skips `cached`, which differs between equal pages
+    response.set_etag(etag_of(body, my_entry), weak=True)
+    return conditional(response, private=bool(requesting_user_id))
 
 
 @leaderboard_bp.route("/leaderboard/recalculate", methods=["POST"])
@@ -151,12 +131,10 @@ def recalculate():
     if exam_id is None:
         return jsonify({"error": "exam_id is required"}), 400
 
-    from app.services.scoring_engine import recalculate_all_ranks
     updated = recalculate_all_ranks(exam_id)
 
-    # Invalidate all pages for this exam
-    # (simplified: we delete the base key pattern)
-    cache.delete(f"leaderboard:exam:{exam_id}")
+    # Invalidate all pages for this exam (bumps the cache version)
+    _invalidate_leaderboard_cache(exam_id, prewarm=prewarm_first_page)
 
     return jsonify({
         "message": "Ranks recalculated",
@@ -169,31 +147,227 @@ def recalculate():
 # Helpers
 # ────────────────────────────────────────────────────────────────────────────
 
-def _get_user_entry(exam_id: int, user_id: int) -> dict | None:
-    """Fetch a single user's leaderboard entry (for the 'my_entry' field)."""
+# Statements are built once at import; per-request values are bind params.
+_lb = LeaderboardSnapshot
+
+_EXAM_META_STMT = (
+    select(Exam.title, ExamStats.participant_count)
+    .outerjoin(ExamStats, ExamStats.exam_id == Exam.exam_id)
+    .where(Exam.exam_id == bindparam("exam_id"))
+)
+
+_PAGE_STMT = (
+    select(*ENTRY_COLUMNS)
+    .join(User, _lb.user_id == User.user_id)
+    .where(_lb.exam_id == bindparam("exam_id"))
+    .order_by(_lb.total_score.desc(), _lb.total_time_sec.asc(), _lb.user_id.asc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+# Offset fallback, and the keyset seek: rows strictly after the cursor in
+# (score DESC, time ASC, user_id ASC) order.
+_PAGE_AT_OFFSET_STMT = _PAGE_STMT.offset(bindparam("offset", type_=Integer))
+_PAGE_AFTER_CURSOR_STMT = _PAGE_STMT.where(or_(
+    _lb.total_score < bindparam("c_score"),
+    and_(_lb.total_score == bindparam("c_score"), _lb.total_time_sec > bindparam("c_time")),
+    and_(
+        _lb.total_score == bindparam("c_score"),
+        _lb.total_time_sec == bindparam("c_time"),
+        _lb.user_id > bindparam("c_user"),
+    ),
+))
+
+_USER_ENTRY_STMT = (
+    select(*ENTRY_COLUMNS)
+    .join(User, _lb.user_id == User.user_id)
+    .where(_lb.exam_id == bindparam("exam_id"), _lb.user_id == bindparam("user_id"))
+)
+
+
+def prewarm_first_page(exam_id: int, version: int) -> None:
+    """
+    Cache the default first page (page 1, default per_page) under a cache
+    version that is about to be published, so the dashboards polling it
+    hit a warm entry on the switch instead of all missing at once.
+    """
+    per_page = _args_schema.fields["per_page"].load_default
+    _get_page_body(exam_id, version, 1, per_page, 0, None, None)
 
-    row = db.session.execute(
-        select(LeaderboardSnapshot, User.username, User.full_name)
-        .join(User, LeaderboardSnapshot.user_id == User.user_id)
-        .where(
-            LeaderboardSnapshot.exam_id == exam_id,
-            LeaderboardSnapshot.user_id == user_id,
-        )
-    ).one_or_none()
 
-    if row is None:
-        return None
+def _get_page_body(
+    exam_id: int, version: int, page: int, per_page: int, position: int,
+    cursor: Cursor | None, after: str | None,
+) -> tuple[bytes | None, bool]:
+    """
+    (body, cached) for one page under cache `version`: the serialised,
+    cacheable part of the response.  body is None if the exam does not exist.
+    """
+    start_part = f"c{after}" if cursor else f"s{position}"
+    key_prefix = f"leaderboard:exam:{exam_id}:v{version}:{start_part}"
+
+    body_key = f"{key_prefix}:pp{per_page}:p{page}"
+    body = cache.get(body_key)
+    if body is not None:
+        return body, True
+
+    # The window under the body is keyed by its start and a per_page
+    # bucket rather than (page, per_page), so nearby page sizes share
+    # one entry; each request slices its own page out of it.
+    bucket = next(b for b in _PER_PAGE_BUCKETS if b >= per_page)
+    # one look-ahead row tells us if there is a next page
+    window, cached = _get_or_build_window(
+        f"{key_prefix}:b{bucket}",
+        lambda: _load_window(exam_id, bucket + 1, position, cursor),
+    )
+    if window is None:
+        return None, False
+
+    body = json_provider.dumps(_page_result(window, exam_id, page, per_page, position))
+    cache.set(body_key, body, timeout=_jittered_ttl())
+    return body, cached
+
+
+def _page_result(window: dict, exam_id: int, page: int, per_page: int, position: int) -> dict:
+    """The cacheable part of a leaderboard response, sliced from `window`."""
+    has_more = len(window["entries"]) > per_page
+    entries = window["entries"][:per_page]
+
+    next_cursor = None
+    if has_more:
+        last = entries[-1]
+        next_cursor = encode_cursor(
+            last["total_score"], last["total_time_sec"], last["user_id"],
+            position + len(entries),
+        )
 
-    lb, username, full_name = row
     return {
-        "rank": lb.rank_position,
-        "user_id": lb.user_id,
-        "username": username,
-        "full_name": full_name,
-        "total_score": float(lb.total_score),
-        "weighted_coding": float(lb.weighted_coding),
-        "weighted_quiz": float(lb.weighted_quiz),
-        "weighted_assessment": float(lb.weighted_assessment),
-        "total_time_sec": lb.total_time_sec,
-        "last_calculated_at": lb.last_calculated_at.isoformat(),
+        "exam_id": exam_id,
+        "exam_title": window["exam_title"],
+        "total_participants": window["participant_count"],
+        "page": page,
+        "per_page": per_page,
+        "leaderboard": entries,
+        "next_cursor": next_cursor,
     }
+
+
+def _jittered_ttl() -> int:
+    """CACHE_DEFAULT_TIMEOUT ±10%, so entries cached together expire apart."""
+    ttl = current_app.config.get("CACHE_DEFAULT_TIMEOUT", 5)
+    return max(1, round(ttl * random.uniform(0.9, 1.1)))
+
+
+def _get_or_build_window(cache_key: str, build) -> tuple[dict | None, bool]:
+    """
+    Return (window, cached) for `cache_key`, calling `build()` on a miss.
+
+    Only one request per key rebuilds (a dogpile lock via cache.add, i.e.
+    SET NX); concurrent misses poll the cache until the window appears or
+    the lock expires, then build it themselves.  The TTL is jittered so
+    pages cached together do not all expire on the same tick.
+    """
+    data = cache.get(cache_key)
+    if data is not None:
+        return json_provider.loads(data), True
+
+    lock_key = f"{cache_key}:lock"
+    deadline = time.monotonic() + _LOCK_TIMEOUT_SEC
+    while not cache.add(lock_key, 1, timeout=_LOCK_TIMEOUT_SEC):
+        time.sleep(_LOCK_POLL_SEC)
+        data = cache.get(cache_key)
+        if data is not None:
+            return json_provider.loads(data), True
+        if time.monotonic() >= deadline:
+            break
+
+    try:
+        window = build()
+        if window is not None:
+            cache.set(cache_key, json_provider.dumps(window), timeout=_jittered_ttl())
+    finally:
+        cache.delete(lock_key)
+
+    return window, False
+
+
+def _load_window(
+    exam_id: int, count: int, position: int, cursor: Cursor | None,
+) -> dict | None:
+    """
+    Up to `count` ranked entries from `position` (or past `cursor`) plus
+    the exam meta — from the Redis sorted set, else MySQL.
+
+    Returns None if the exam does not exist.
+    """
+    stored = leaderboard_store.read_page(exam_id, count, start=position, after=cursor)
+    if stored is None:
+        stored = _read_page_from_db(exam_id, count, position, cursor)
+        if stored is None:
+            return None
+
+    meta, entries = stored
+    return {**meta, "entries": entries}
+
+
+def _read_page_from_db(
+    exam_id: int, count: int, position: int, cursor: Cursor | None,
+) -> tuple[dict, list[dict]] | None:
+    """
+    MySQL fallback for `leaderboard_store.read_page`.
+
+    Returns None if the exam does not exist.
+    """
+    # Exam title + participant count (maintained in exam_stats by the
+    # scoring engine) in one round-trip, instead of a COUNT(*) scan.
+    exam = db.session.execute(_EXAM_META_STMT, {"exam_id": exam_id}).one_or_none()
+    if exam is None:
+        return None
+
+    # Seek past the cursor when given, so the database walks the index
+    # from that key instead of skipping OFFSET rows.
+    if cursor:
+        stmt = _PAGE_AFTER_CURSOR_STMT
+        params = {
+            "c_score": cursor.total_score, "c_time": cursor.total_time_sec,
+            "c_user": cursor.user_id,
+        }
+    else:
+        stmt = _PAGE_AT_OFFSET_STMT
+        params = {"offset": position}
+
+    rows = db.session.execute(
+        stmt, {"exam_id": exam_id, "limit": count, **params},
+    ).mappings().all()
+    meta = {"exam_title": exam.title, "participant_count": exam.participant_count or 0}
+    return meta, [entry_from_row(row) for row in rows]
+
+
+def _get_user_entry_json(exam_id: int, user_id: int, version: int) -> bytes:
+    """
+    `_get_user_entry` as JSON bytes (b"null" for non-participants), served
+    from the Redis store when available, else from a per-(exam, user) cache.
+
+    The cache key carries the exam's cache version, so a score change
+    invalidates it together with the pages and the entry is shared across
+    every page the user browses.
+    """
+    available, payload = leaderboard_store.read_entry(exam_id, user_id)
+    if available:
+        return payload if payload is not None else b"null"
+
+    key = f"leaderboard:exam:{exam_id}:v{version}:user:{user_id}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = json_provider.dumps(_get_user_entry(exam_id, user_id))
+        cache.set(key, payload, timeout=current_app.config.get("MY_ENTRY_CACHE_TTL", 60))
+    return payload
+
+
+def _get_user_entry(exam_id: int, user_id: int) -> dict | None:
+    """Fetch a single user's leaderboard entry (for the 'my_entry' field)."""
+
+    row = db.session.execute(
+        _USER_ENTRY_STMT, {"exam_id": exam_id, "user_id": user_id},
+    ).mappings().one_or_none()
+
+    return entry_from_row(row) if row is not None else None
@@ -0,0 +1,43 @@
+"""
+Keyset (seek) pagination cursors for the ranked leaderboard endpoints.
+
+Rows are ordered by (total_score DESC, total_time_sec ASC, user_id ASC).
+A cursor captures the sort key of the last row served plus its 1-based
+position, so the next page is an index seek past that key instead of an
+OFFSET scan, and row numbers stay continuous across pages.
+"""
+
+from __future__ import annotations
+
+import base64
+from typing import NamedTuple
+
+import orjson
+
+
+class Cursor(NamedTuple):
+    total_score: float
+    total_time_sec: int
+    user_id: int
+    position: int
+
+
+def encode_cursor(total_score: float, total_time_sec: int, user_id: int, position: int) -> str:
+    """Return an opaque, URL-safe cursor for the row with this sort key."""
+    raw = orjson.dumps([total_score, total_time_sec, user_id, position])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str) -> Cursor:
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Raises:
+        ValueError – if the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        score, time_sec, user_id, position = orjson.loads(raw)
+        return Cursor(float(score), int(time_sec), int(user_id), int(position))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -12,7 +12,9 @@ from flask import Blueprint, request, jsonify
 from marshmallow import ValidationError
 
 from app.schemas import SubmitScoreSchema
-from app.services.scoring_engine import submit_module_score
+from app.services.scoring_engine import (
+    IdempotencyKeyInFlight, IdempotencyKeyReused, submit_module_score,
+)
 
 scores_bp = Blueprint("scores", __name__)
 logger = logging.getLogger(__name__)
@@ -47,9 +49,13 @@ def submit_score():
     }
 
     Concurrency guarantee:
-      - Uses SERIALIZABLE isolation + SELECT … FOR UPDATE to prevent
-        race conditions when N students submit simultaneously.
-      - Optimistic lock retries on deadlock (up to 3 times).
+      - Version-checked UPDATEs (optimistic locking) detect concurrent
+        writes to the same session when N students submit simultaneously.
+      - Conflicts and deadlocks are retried (up to 3 times).
+      - An optional `Idempotency-Key` header makes client retries safe: a
+        repeated key for the same session and module replays the first
+        response; reusing it with a different payload is a 422, and
+        repeating it while the first request is still running is a 409.
     """
 
     # ── Validate request ───────────────────────────────────────────────
@@ -68,6 +74,7 @@ def submit_score():
             time_spent_sec=data["time_spent_sec"],
             details=data.get("details"),
             changed_by=0,  # In production, extract from JWT / auth context
+            idempotency_key=request.headers.get("Idempotency-Key"),
         )
 
         return jsonify({
@@ -75,6 +82,12 @@ def submit_score():
             "leaderboard_entry": entry,
         }), 200
 
+    except IdempotencyKeyReused as err:
+        return jsonify({"error": str(err)}), 422
+
+    except IdempotencyKeyInFlight as err:
+        return jsonify({"error": str(err)}), 409
+
     except ValueError as err:
         return jsonify({"error": str(err)}), 400
 
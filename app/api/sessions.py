@@ -11,19 +11,42 @@ from __future__ import annotations
 import logging
 from datetime import datetime, timezone
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from marshmallow import ValidationError
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
-from app.extensions import db
+from app.extensions import db, cache
 from app.models import ExamSession, Exam, ModuleScore
-from app.schemas import CreateSessionSchema, SessionResponseSchema
+from app.schemas import CreateSessionSchema
+from app.services.rank_tasks import schedule_rank_refresh
 
 sessions_bp = Blueprint("sessions", __name__)
 logger = logging.getLogger(__name__)
 
 _create_schema = CreateSessionSchema()
-_session_response = SessionResponseSchema()
+
+# One parent query plus one IN-list query for the scores, loading only the
+# ModuleScore columns ModuleScore.to_dict() serialises.
+_SESSION_WITH_SCORES_STMT = (
+    select(ExamSession)
+    .where(ExamSession.session_id == bindparam("session_id"))
+    .options(
+        selectinload(ExamSession.module_scores).load_only(
+            ModuleScore.score_id, ModuleScore.module_type,
+            ModuleScore.raw_score, ModuleScore.max_score,
+            ModuleScore.time_spent_sec, ModuleScore.details,
+        )
+    )
+)
+
+_EXISTING_SESSION_STMT = select(ExamSession.session_id).where(
+    ExamSession.exam_id == bindparam("exam_id"),
+    ExamSession.user_id == bindparam("user_id"),
+)
+
+_EXAM_STATUS_STMT = select(Exam.status).where(Exam.exam_id == bindparam("exam_id"))
 
 
 @sessions_bp.route("/sessions", methods=["POST"])
@@ -36,43 +59,47 @@ def create_session():
     """
 
     try:
-        data = _create_schema.load(request.get_json(silent=True) or {})
+        data = _load_create_body(request.get_json(silent=True) or {})
     except ValidationError as err:
         return jsonify({"errors": err.messages}), 422
 
     # Check exam exists and is active
-    exam = db.session.get(Exam, data["exam_id"])
-    if exam is None:
+    exam_status = _get_exam_status(data["exam_id"])
+    if exam_status is None:
         return jsonify({"error": "Exam not found"}), 404
-    if exam.status != "active":
-        return jsonify({"error": f"Exam is not active (status: {exam.status})"}), 400
-
-    # Check for existing session
-    existing = db.session.execute(
-        select(ExamSession).where(
-            ExamSession.exam_id == data["exam_id"],
-            ExamSession.user_id == data["user_id"],
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        return jsonify({
-            "error": "Session already exists",
-            "session_id": existing.session_id,
-        }), 409
+    if exam_status != "active":
+        return jsonify({"error": f"Exam is not active (status: {exam_status})"}), 400
 
+    # Insert first: the uq_exam_user constraint is the existence check, so
+    # the common path is one INSERT and a duplicate costs one extra SELECT.
     session = ExamSession(
         exam_id=data["exam_id"],
         user_id=data["user_id"],
         status="in_progress",
     )
     db.session.add(session)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        existing_id = db.session.execute(
+            _EXISTING_SESSION_STMT, {"exam_id": data["exam_id"], "user_id": data["user_id"]}
+        ).scalar_one_or_none()
+        if existing_id is None:
+            raise
+        return jsonify({
+            "error": "Session already exists",
+            "session_id": existing_id,
+        }), 409
+
+    # Read before commit — expire_on_commit would reload the row
+    session_id, started_at = session.session_id, session.started_at
     db.session.commit()
 
     return jsonify({
         "message": "Session created",
-        "session_id": session.session_id,
-        "started_at": session.started_at.isoformat(),
+        "session_id": session_id,
+        "started_at": started_at,
     }), 201
 
 
@@ -80,11 +107,13 @@ def create_session():
 def get_session(session_id: int):
     """GET /api/v1/sessions/<id> — returns session with module scores."""
 
-    session = db.session.get(ExamSession, session_id)
+    session = db.session.execute(
+        _SESSION_WITH_SCORES_STMT, {"session_id": session_id}
+    ).scalar_one_or_none()
     if session is None:
         return jsonify({"error": "Session not found"}), 404
 
-    return jsonify(_session_response.dump(session)), 200
+    return jsonify(session.to_dict()), 200
 
 
 @sessions_bp.route("/sessions/<int:session_id>/finish", methods=["PATCH"])
@@ -93,18 +122,10 @@ def finish_session(session_id: int):
     PATCH /api/v1/sessions/<id>/finish
 
     Marks the session as submitted and records the finish time.
-    Triggers a final leaderboard recalculation for this user.
+    Queues a leaderboard recalculation for the exam (see rank_tasks).
     """
 
-    session: ExamSession | None = (
-        db.session.execute(
-            select(ExamSession)
-            .where(ExamSession.session_id == session_id)
-            .with_for_update()
-        )
-        .scalar_one_or_none()
-    )
-
+    session = db.session.get(ExamSession, session_id)
     if session is None:
         return jsonify({"error": "Session not found"}), 404
 
@@ -113,22 +134,89 @@ def finish_session(session_id: int):
             "error": f"Session cannot be finished (current status: {session.status})"
         }), 400
 
+    # Optimistic lock: the UPDATE only matches if nobody changed the row
+    # since we read it, so the happy path takes no SELECT … FOR UPDATE.
     now = datetime.now(timezone.utc)
-    session.finished_at = now
-    session.total_time_sec = int((now - session.started_at).total_seconds())
-    session.status = "submitted"
-    session.version += 1
+    total_time_sec = int((now - _as_utc(session.started_at)).total_seconds())
+    result = db.session.execute(
+        update(ExamSession)
+        .where(
+            ExamSession.session_id == session_id,
+            ExamSession.version == session.version,
+            ExamSession.status == "in_progress",
+        )
+        .values(
+            status="submitted",
+            finished_at=now,
+            total_time_sec=total_time_sec,
+            version=ExamSession.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
+        return jsonify({"error": "Concurrent update conflict. Please retry."}), 409
 
+    exam_id = session.exam_id
     db.session.commit()
 
-    # Trigger final score + rank recalculation
-    from app.services.scoring_engine import recalculate_all_ranks, _invalidate_leaderboard_cache
-    recalculate_all_ranks(session.exam_id)
-    _invalidate_leaderboard_cache(session.exam_id)
+    # Re-rank in the background — O(participants), so off the request path
+    schedule_rank_refresh(exam_id)
 
     return jsonify({
         "message": "Session submitted",
-        "session_id": session.session_id,
-        "finished_at": session.finished_at.isoformat(),
-        "total_time_sec": session.total_time_sec,
+        "session_id": session_id,
+        "finished_at": now,
+        "total_time_sec": total_time_sec,
     }), 200
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Helpers
+# ────────────────────────────────────────────────────────────────────────────
+
+def _load_create_body(payload) -> dict:
+    """
+    Validate a POST /sessions body.
+
+    Well-formed bodies are exactly two plain ints, so they are checked
+    inline; anything else goes through CreateSessionSchema, which produces
+    the usual per-field error messages.
+    """
+    if (
+        type(payload) is dict
+        and len(payload) == 2
+        and type(payload.get("exam_id")) is int
+        and type(payload.get("user_id")) is int
+    ):
+        return payload
+    return _create_schema.load(payload)
+
+
+def _get_exam_status(exam_id: int) -> str | None:
+    """
+    The exam's status, or None if it does not exist.
+
+    Every session start reads it, but it only changes when an exam is
+    opened or closed, so it is cached for EXAM_STATUS_CACHE_TTL seconds;
+    a status change should delete `_exam_status_key(exam_id)`.
+    """
+    key = _exam_status_key(exam_id)
+    status = cache.get(key)
+    if status is None:
+        status = db.session.execute(_EXAM_STATUS_STMT, {"exam_id": exam_id}).scalar_one_or_none()
+        if status is not None:
+            cache.set(key, status, timeout=current_app.config["EXAM_STATUS_CACHE_TTL"])
+    return status
+
+
+def _exam_status_key(exam_id: int) -> str:
+    return f"exam:{exam_id}:status"
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    DATETIME columns come back naive (MySQL stores no offset) but always
+    hold UTC — tag them so they subtract cleanly from an aware `now`.
+    """
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
@@ -2,12 +2,16 @@
 Shared Flask extensions — instantiated once, initialised in create_app().
 """
 
+from celery import Celery
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_caching import Cache
+from flask_compress import Compress
 from flask_marshmallow import Marshmallow
 
 db = SQLAlchemy()
 migrate = Migrate()
 cache = Cache()
+compress = Compress()
 ma = Marshmallow()
+celery = Celery("leaderboard")
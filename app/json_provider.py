@@ -0,0 +1,54 @@
+"""
+orjson-backed JSON provider — replaces Flask's stdlib `json` encoder.
+
+Registered in create_app() so every `jsonify(...)` goes through orjson's
+C encoder.  The module-level `dumps` / `loads` are shared with the cache
+layer so cached payloads and live responses are byte-for-byte identical.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from flask import Response
+from flask.json.provider import JSONProvider
+
+_OPTIONS = orjson.OPT_NAIVE_UTC
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not encode natively."""
+    # Exact type check: no MRO walk for the common residual-Decimal case
+    # (DECIMAL aggregates from raw text() SQL).
+    if type(obj) is Decimal:
+        return float(obj)
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` to compact JSON bytes."""
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def loads(data: bytes | str) -> Any:
+    return orjson.loads(data)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider using orjson for both encoding and decoding."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """
+        Build the `jsonify` response straight from orjson's bytes — the base
+        class goes through `dumps()`, i.e. bytes → str → bytes again.
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype="application/json")
@@ -7,12 +7,14 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Optional
 
+from flask import current_app, has_app_context
 from sqlalchemy import (
     String, Text, Enum, Integer, BigInteger, Boolean,
     DateTime, Numeric, JSON, ForeignKey, UniqueConstraint,
-    Index, CheckConstraint,
+    Index, CheckConstraint, FetchedValue, event, func,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Mapped, ORMExecuteState, Session, mapped_column, relationship
 
 from app.extensions import db
 
@@ -20,10 +22,35 @@ from app.extensions import db
 # ────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ────────────────────────────────────────────────────────────────────────────
+# Audit timestamps (created_at / updated_at) are stamped by the database —
+# DEFAULT CURRENT_TIMESTAMP [ON UPDATE CURRENT_TIMESTAMP] in schema.sql, in
+# UTC via the connection's time_zone.  Columns the app reads straight back
+# after an insert keep a Python default, avoiding a re-SELECT.
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+# Collections are loaded explicitly (selectinload) at each call site.  With
+# RAISE_ON_LAZY_COLLECTIONS set (development, testing) an unplanned lazy
+# load raises instead of quietly adding a query per parent; otherwise it
+# is a plain lazy SELECT.  The flag is read from the app config on each
+# load, so one process can serve apps with either setting.
+@event.listens_for(Session, "do_orm_execute")
+def _raise_on_lazy_collection_load(orm_execute_state: ORMExecuteState) -> None:
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    if not has_app_context():
+        return
+    if not current_app.config.get("RAISE_ON_LAZY_COLLECTIONS"):
+        return
+    prop = orm_execute_state.loader_strategy_path.prop
+    if prop.uselist:
+        raise InvalidRequestError(
+            f"'{prop}' is not loaded; add a loader option (e.g. selectinload) "
+            f"to the query, as RAISE_ON_LAZY_COLLECTIONS is set"
+        )
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # 1. User
 # ────────────────────────────────────────────────────────────────────────────
@@ -40,11 +67,13 @@ class User(db.Model):
         default="candidate", nullable=False,
     )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, onupdate=_utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), server_onupdate=FetchedValue(), nullable=False,
+    )
 
     # Relationships
-    sessions: Mapped[list["ExamSession"]] = relationship(back_populates="user", lazy="dynamic")
+    sessions: Mapped[list["ExamSession"]] = relationship(back_populates="user")
 
     def __repr__(self) -> str:
         return f"<User {self.username}>"
@@ -61,14 +90,15 @@ class Exam(db.Model):
     description: Mapped[Optional[str]] = mapped_column(Text)
     duration_minutes: Mapped[int] = mapped_column(Integer, default=120, nullable=False)
 
-    # Configurable weights (must sum to 100)
-    weight_coding: Mapped[float] = mapped_column(Numeric(5, 2), default=50.00, nullable=False)
-    weight_quiz: Mapped[float] = mapped_column(Numeric(5, 2), default=30.00, nullable=False)
-    weight_assessment: Mapped[float] = mapped_column(Numeric(5, 2), default=20.00, nullable=False)
+    # Configurable weights (must sum to 100).  Score columns stay exact
+    # DECIMAL in MySQL but load as float (asdecimal=False).
+    weight_coding: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=50.00, nullable=False)
+    weight_quiz: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=30.00, nullable=False)
+    weight_assessment: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=20.00, nullable=False)
 
-    max_score_coding: Mapped[float] = mapped_column(Numeric(10, 2), default=100.00, nullable=False)
-    max_score_quiz: Mapped[float] = mapped_column(Numeric(10, 2), default=100.00, nullable=False)
-    max_score_assessment: Mapped[float] = mapped_column(Numeric(10, 2), default=100.00, nullable=False)
+    max_score_coding: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), default=100.00, nullable=False)
+    max_score_quiz: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), default=100.00, nullable=False)
+    max_score_assessment: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), default=100.00, nullable=False)
 
     status: Mapped[str] = mapped_column(
         Enum("draft", "scheduled", "active", "completed", "archived", name="exam_status"),
@@ -77,11 +107,13 @@ class Exam(db.Model):
     starts_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     ends_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     created_by: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, onupdate=_utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), server_onupdate=FetchedValue(), nullable=False,
+    )
 
     # Relationships
-    sessions: Mapped[list["ExamSession"]] = relationship(back_populates="exam", lazy="dynamic")
+    sessions: Mapped[list["ExamSession"]] = relationship(back_populates="exam")
 
     __table_args__ = (
         CheckConstraint(
@@ -117,17 +149,22 @@ class ExamSession(db.Model):
     # Optimistic locking version
     version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, onupdate=_utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), server_onupdate=FetchedValue(), nullable=False,
+    )
 
     # Relationships
     exam: Mapped["Exam"] = relationship(back_populates="sessions")
     user: Mapped["User"] = relationship(back_populates="sessions")
     module_scores: Mapped[list["ModuleScore"]] = relationship(
-        back_populates="session", lazy="joined", cascade="all, delete-orphan",
+        back_populates="session", cascade="all, delete-orphan",
+        passive_deletes=True,  # FK ON DELETE CASCADE removes them in MySQL
     )
 
     __table_args__ = (
+        # Also covers the duplicate check in create_session: InnoDB appends
+        # the PK (session_id) to secondary indexes, so it is index-only.
         UniqueConstraint("exam_id", "user_id", name="uq_exam_user"),
         Index("idx_session_status", "status"),
     )
@@ -135,6 +172,22 @@ class ExamSession(db.Model):
     def __repr__(self) -> str:
         return f"<ExamSession exam={self.exam_id} user={self.user_id}>"
 
+    def to_dict(self) -> dict:
+        """
+        GET /sessions/<id> body (mirrors SessionResponseSchema).  Datetimes
+        are left for orjson to encode as RFC 3339 in C (naive = UTC).
+        """
+        return {
+            "session_id": self.session_id,
+            "exam_id": self.exam_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total_time_sec": self.total_time_sec,
+            "module_scores": [ms.to_dict() for ms in self.module_scores],
+        }
+
 
 # ────────────────────────────────────────────────────────────────────────────
 # 4. Module Score
@@ -143,33 +196,55 @@ class ModuleScore(db.Model):
     __tablename__ = "module_scores"
 
     score_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
-    session_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("exam_sessions.session_id"), nullable=False)
+    session_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("exam_sessions.session_id", ondelete="CASCADE"), nullable=False,
+    )
     module_type: Mapped[str] = mapped_column(
         Enum("coding", "quiz", "assessment", name="module_type_enum"),
         nullable=False,
     )
 
-    raw_score: Mapped[float] = mapped_column(Numeric(10, 2), default=0.00, nullable=False)
-    max_score: Mapped[float] = mapped_column(Numeric(10, 2), default=100.00, nullable=False)
+    raw_score: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), default=0.00, nullable=False)
+    max_score: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), default=100.00, nullable=False)
     time_spent_sec: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     details: Mapped[Optional[dict]] = mapped_column(JSON)
 
     # Optimistic locking version
     version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, onupdate=_utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), server_onupdate=FetchedValue(), nullable=False,
+    )
 
     # Relationships
     session: Mapped["ExamSession"] = relationship(back_populates="module_scores")
 
     __table_args__ = (
+        # Leading session_id serves the per-session lookups (and the
+        # selectinload IN query) — no separate session_id index needed.
         UniqueConstraint("session_id", "module_type", name="uq_session_module"),
+        CheckConstraint(
+            "raw_score >= 0 AND raw_score <= max_score",
+            name="ck_modscore_raw_le_max",
+        ),
     )
 
     def __repr__(self) -> str:
         return f"<ModuleScore session={self.session_id} type={self.module_type}>"
 
+    def to_dict(self) -> dict:
+        """Mirrors ModuleScoreResponseSchema; touches only the columns
+        get_session's load_only() fetches."""
+        return {
+            "score_id": self.score_id,
+            "module_type": self.module_type,
+            "raw_score": self.raw_score,
+            "max_score": self.max_score,
+            "time_spent_sec": self.time_spent_sec,
+            "details": self.details,
+        }
+
 
 # ────────────────────────────────────────────────────────────────────────────
 # 5. Leaderboard Snapshot
@@ -182,14 +257,30 @@ class LeaderboardSnapshot(db.Model):
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=False)
     session_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("exam_sessions.session_id"), nullable=False)
 
-    weighted_coding: Mapped[float] = mapped_column(Numeric(10, 4), default=0.0, nullable=False)
-    weighted_quiz: Mapped[float] = mapped_column(Numeric(10, 4), default=0.0, nullable=False)
-    weighted_assessment: Mapped[float] = mapped_column(Numeric(10, 4), default=0.0, nullable=False)
+    # asdecimal=False: the driver hands back floats, so the hot read paths
+    # never build a decimal.Decimal per cell.
+    weighted_coding: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    weighted_quiz: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    weighted_assessment: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
 
-    total_score: Mapped[float] = mapped_column(Numeric(10, 4), default=0.0, nullable=False)
+    total_score: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
     total_time_sec: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     rank_position: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
+    # Derived analytics — materialised by _refresh_ranks() at write time so
+    # the analytics read path needs no window functions.
+    standard_rank: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    percentile_rank: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=0.0, nullable=False)
+    quartile: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    decile: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    running_avg: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    z_score: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    coding_rank: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    quiz_rank: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    assessment_rank: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    speed_rank: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    performance_tier: Mapped[str] = mapped_column(String(32), default="Needs Improvement", nullable=False)
+
     last_calculated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
 
     # Relationships
@@ -198,7 +289,13 @@ class LeaderboardSnapshot(db.Model):
 
     __table_args__ = (
         UniqueConstraint("exam_id", "user_id", name="uq_lb_exam_user"),
-        Index("idx_lb_rank", "exam_id", "total_score", "total_time_sec"),
+        # Leading columns match the ranking ORDER BY; the trailing ones make
+        # the paged leaderboard read covering (InnoDB appends the PK itself).
+        Index(
+            "idx_lb_exam_score_time",
+            "exam_id", "total_score", "total_time_sec", "user_id",
+            "weighted_coding", "weighted_quiz", "weighted_assessment",
+        ),
     )
 
     def __repr__(self) -> str:
@@ -217,11 +314,31 @@ class ScoreAuditLog(db.Model):
         Enum("coding", "quiz", "assessment", name="audit_module_type"),
         nullable=False,
     )
-    old_score: Mapped[Optional[float]] = mapped_column(Numeric(10, 2))
-    new_score: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    old_score: Mapped[Optional[float]] = mapped_column(Numeric(10, 2, asdecimal=False))
+    new_score: Mapped[float] = mapped_column(Numeric(10, 2, asdecimal=False), nullable=False)
     changed_by: Mapped[int] = mapped_column(BigInteger, nullable=False)
     change_reason: Mapped[Optional[str]] = mapped_column(String(255))
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     def __repr__(self) -> str:
         return f"<AuditLog session={self.session_id} module={self.module_type}>"
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# 7. Exam Stats — one row of exam-wide aggregates, refreshed with the ranks
+# ────────────────────────────────────────────────────────────────────────────
+class ExamStats(db.Model):
+    __tablename__ = "exam_stats"
+
+    exam_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("exams.exam_id"), primary_key=True)
+
+    participant_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    avg_score: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    stddev_score: Mapped[float] = mapped_column(Numeric(10, 4, asdecimal=False), default=0.0, nullable=False)
+    pass_rate_pct: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=0.0, nullable=False)
+    distinction_rate_pct: Mapped[float] = mapped_column(Numeric(5, 2, asdecimal=False), default=0.0, nullable=False)
+
+    last_calculated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ExamStats exam={self.exam_id} participants={self.participant_count}>"
@@ -2,7 +2,9 @@
 Marshmallow schemas for request validation and response serialisation.
 """
 
-from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from marshmallow import (
+    EXCLUDE, Schema, fields, post_load, validate, validates_schema, ValidationError,
+)
 
 
 # ────────────────────────────────────────────────────────────────────────────
@@ -43,6 +45,25 @@ class FinishSessionSchema(Schema):
     pass  # no body required
 
 
+class GetLeaderboardArgsSchema(Schema):
+    """GET /api/v1/leaderboard — query-string parameters."""
+
+    class Meta:
+        unknown = EXCLUDE  # ignore cache-busters and other extra params
+
+    exam_id = fields.Integer(required=True)
+    page = fields.Integer(load_default=1)
+    per_page = fields.Integer(load_default=50)
+    user_id = fields.Integer(load_default=None)
+    after = fields.String(load_default=None)
+
+    @post_load
+    def clamp_paging(self, data, **kwargs):
+        data["page"] = max(1, data["page"])
+        data["per_page"] = min(200, max(1, data["per_page"]))
+        return data
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # Response Schemas
 # ────────────────────────────────────────────────────────────────────────────
@@ -64,7 +85,7 @@ class LeaderboardResponseSchema(Schema):
     exam_id = fields.Integer()
     exam_title = fields.String()
     total_participants = fields.Integer()
-    leaderboard = fields.List(fields.Nested(LeaderboardEntrySchema))
+    leaderboard = fields.Nested(LeaderboardEntrySchema, many=True)
     cached = fields.Boolean()
 
 
@@ -85,4 +106,4 @@ class SessionResponseSchema(Schema):
     started_at = fields.DateTime()
     finished_at = fields.DateTime(allow_none=True)
     total_time_sec = fields.Integer()
-    module_scores = fields.List(fields.Nested(ModuleScoreResponseSchema))
+    module_scores = fields.Nested(ModuleScoreResponseSchema, many=True)
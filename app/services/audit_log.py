@@ -0,0 +1,149 @@
+"""
+Audit Log — score changes recorded off the submission's critical path
+
+`score_audit_log` is append-only and only read for forensics, so its rows
+need not commit with the score.  POST /scores commits, then `record()`
+queues the row on a Redis list; a Celery job drains the list with one
+multi-row INSERT per batch:
+
+  audit:pending     LIST  JSON-encoded score_audit_log rows, oldest first
+  audit:processing  LIST  the batch being inserted; cleared after commit
+
+Submissions coalesce into a single drain job the same way rank refreshes
+do (see rank_tasks).  `created_at` is stamped at submission, not at drain.
+
+Each batch is moved onto `audit:processing` before the INSERT and only
+deleted once it has committed.  A failed or killed drain leaves the batch
+there and the next drain inserts it first, so rows are delivered at least
+once.  One drain runs at a time; a drain that finds another running
+returns and leaves the rows for the running one (or the next submission).
+
+Without Redis (development SimpleCache), or when the push fails, the row
+is inserted and committed inline instead.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import current_app
+from kombu.exceptions import OperationalError as BrokerError
+from redis.exceptions import RedisError
+from sqlalchemy import insert
+
+from app import json_provider
+from app.extensions import db, cache, celery
+from app.models import ScoreAuditLog
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_KEY = "audit:pending"
+_PROCESSING_KEY = "audit:processing"
+_PENDING_KEY = "audit:flush_pending"
+_LOCK_KEY = "audit:flush_lock"
+_LOCK_TIMEOUT_SEC = 300
+BATCH_SIZE = 500
+
+
+def record(
+    session_id: int,
+    module_type: str,
+    old_score: Optional[float],
+    new_score: float,
+    changed_by: int,
+    change_reason: str = "module_submission",
+) -> None:
+    """Queue one audit row.  Call after the score change has committed."""
+    row = {
+        "session_id": session_id,
+        "module_type": module_type,
+        "old_score": old_score,
+        "new_score": new_score,
+        "changed_by": changed_by,
+        "change_reason": change_reason,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+    client = _client()
+    if client is not None:
+        try:
+            client.rpush(_QUEUE_KEY, json_provider.dumps(row))
+        except RedisError as exc:
+            logger.warning("Audit row not queued for session %s: %s", session_id, exc)
+        else:
+            _schedule_flush()
+            return
+
+    db.session.add(ScoreAuditLog(**row))
+    db.session.commit()
+
+
+@celery.task(name="leaderboard.flush_audit_log")
+def flush_audit_log() -> int:
+    """Insert every queued audit row, BATCH_SIZE at a time.  Returns the count."""
+    cache.delete(_PENDING_KEY)
+    client = _client()
+    if client is None:
+        return 0
+
+    if not cache.add(_LOCK_KEY, 1, timeout=_LOCK_TIMEOUT_SEC):
+        return 0
+
+    try:
+        flushed = 0
+        # A batch left over from a drain that died before its commit goes first
+        batch = client.lrange(_PROCESSING_KEY, 0, -1) or _claim_batch(client)
+        while batch:
+            try:
+                db.session.execute(insert(ScoreAuditLog), [_decode(raw) for raw in batch])
+                db.session.commit()
+            except Exception:
+                # The batch stays on audit:processing for the next drain
+                db.session.rollback()
+                raise
+
+            client.delete(_PROCESSING_KEY)
+            flushed += len(batch)
+            batch = _claim_batch(client)
+    finally:
+        cache.delete(_LOCK_KEY)
+
+    return flushed
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# HELPERS
+# ────────────────────────────────────────────────────────────────────────────
+
+def _schedule_flush() -> None:
+    """Queue a drain job unless one is already pending."""
+    if not cache.add(_PENDING_KEY, 1, timeout=current_app.config["AUDIT_FLUSH_DEBOUNCE_SEC"]):
+        return
+
+    try:
+        flush_audit_log.delay()
+    except BrokerError as exc:
+        # Rows stay queued in Redis; the next submission retries the enqueue
+        cache.delete(_PENDING_KEY)
+        logger.warning("Audit flush not queued: %s", exc)
+
+
+def _claim_batch(client) -> list[bytes]:
+    """Move up to BATCH_SIZE rows, oldest first, onto the processing list."""
+    pipe = client.pipeline(transaction=True)
+    for _ in range(BATCH_SIZE):
+        pipe.lmove(_QUEUE_KEY, _PROCESSING_KEY, "LEFT", "RIGHT")
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def _client():
+    """The raw redis-py client behind Flask-Caching, or None if not Redis."""
+    return getattr(cache.cache, "_write_client", None)
+
+
+def _decode(raw: bytes) -> dict:
+    row = json_provider.loads(raw)
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return row
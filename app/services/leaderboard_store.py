@@ -0,0 +1,224 @@
+"""
+Leaderboard Store — Redis sorted-set read model for GET /leaderboard
+
+MySQL stays the source of truth; after every committed score change the
+scoring engine rebuilds this copy so the read path never touches the
+database:
+
+  lb:{exam_id}:rank     ZSET  member = zero-padded user_id, score = sort key
+  lb:{exam_id}:entries  HASH  user_id → pre-serialised leaderboard entry
+  lb:{exam_id}:meta     HASH  exam_title, participant_count
+
+The sort key packs (total_score DESC, total_time_sec ASC) into one exactly
+representable double, negated so an ascending ZRANGE yields leaderboard
+order; equal keys fall back to member order, i.e. user_id ASC — the same
+order the SQL queries use, so positions and cursors agree with the DB.
+
+Every function degrades to "not available" (None) when the cache backend
+is not Redis or Redis is unreachable; callers then fall back to MySQL.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, select
+
+from app import json_provider
+from app.extensions import db, cache
+from app.models import Exam, LeaderboardSnapshot, User
+
+logger = logging.getLogger(__name__)
+
+# total_score has 4 decimals and is ≤ 100 → ≤ 10^6 after scaling; times
+# below 10^7 s fit underneath, and the product stays far below 2^53.
+_SCORE_SCALE = 10_000
+_TIME_SPAN = 10 ** 7
+_MEMBER_WIDTH = 20
+
+# Only the columns a leaderboard entry serialises — selected as plain rows,
+# so no LeaderboardSnapshot instances are built or tracked in the session.
+ENTRY_COLUMNS = (
+    LeaderboardSnapshot.rank_position,
+    LeaderboardSnapshot.user_id,
+    User.username,
+    User.full_name,
+    LeaderboardSnapshot.total_score,
+    LeaderboardSnapshot.weighted_coding,
+    LeaderboardSnapshot.weighted_quiz,
+    LeaderboardSnapshot.weighted_assessment,
+    LeaderboardSnapshot.total_time_sec,
+    LeaderboardSnapshot.last_calculated_at,
+)
+
+_EXAM_TITLE_STMT = select(Exam.title).where(Exam.exam_id == bindparam("exam_id"))
+
+_EXAM_ENTRIES_STMT = (
+    select(*ENTRY_COLUMNS)
+    .join(User, LeaderboardSnapshot.user_id == User.user_id)
+    .where(LeaderboardSnapshot.exam_id == bindparam("exam_id"))
+)
+
+
+def entry_from_row(row) -> dict:
+    """Build a leaderboard entry from an `ENTRY_COLUMNS` mapping row."""
+    return {
+        "rank": row["rank_position"],
+        "user_id": row["user_id"],
+        "username": row["username"],
+        "full_name": row["full_name"],
+        "total_score": row["total_score"],
+        "weighted_coding": row["weighted_coding"],
+        "weighted_quiz": row["weighted_quiz"],
+        "weighted_assessment": row["weighted_assessment"],
+        "total_time_sec": row["total_time_sec"],
+        "last_calculated_at": row["last_calculated_at"].isoformat(),
+    }
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# WRITE PATH
+# ────────────────────────────────────────────────────────────────────────────
+
+def rebuild(exam_id: int) -> None:
+    """
+    Replace the exam's sorted set, entry hash and meta from MySQL.
+
+    Must run after the score transaction commits.  The three keys are
+    swapped in one MULTI/EXEC, so readers see either the old or the new
+    leaderboard, never a mix.  A full rebuild (rather than a single ZADD)
+    is needed because one score change can shift every dense rank.
+    """
+    client = _client()
+    if client is None:
+        return
+
+    title = db.session.execute(_EXAM_TITLE_STMT, {"exam_id": exam_id}).scalar_one_or_none()
+    if title is None:
+        return
+
+    rows = db.session.execute(_EXAM_ENTRIES_STMT, {"exam_id": exam_id}).mappings().all()
+
+    ranking = {}
+    entries = {}
+    for row in rows:
+        entry = entry_from_row(row)
+        ranking[_member(entry["user_id"])] = _sort_key(
+            entry["total_score"], entry["total_time_sec"]
+        )
+        entries[entry["user_id"]] = json_provider.dumps(entry)
+
+    rank_key, entries_key, meta_key = _keys(exam_id)
+    try:
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(rank_key, entries_key, meta_key)
+        if ranking:
+            pipe.zadd(rank_key, ranking)
+            pipe.hset(entries_key, mapping=entries)
+        pipe.hset(meta_key, mapping={"exam_title": title, "participant_count": len(rows)})
+        pipe.execute()
+    except RedisError as exc:
+        logger.warning("Leaderboard store rebuild failed for exam %s: %s", exam_id, exc)
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# READ PATH
+# ────────────────────────────────────────────────────────────────────────────
+
+def read_page(
+    exam_id: int,
+    count: int,
+    start: int = 0,
+    after: Optional[tuple] = None,
+) -> Optional[tuple[dict, list[dict]]]:
+    """
+    Return (meta, entries) for `count` rows from `start`, or from just past
+    `after` — the (total_score, total_time_sec, user_id, …) of the last row
+    served, e.g. a pagination Cursor.
+
+    Returns None when the store is unavailable, not yet built for this
+    exam, or the cursor row has since moved (the caller re-seeks in SQL).
+    """
+    client = _client()
+    if client is None:
+        return None
+
+    rank_key, entries_key, meta_key = _keys(exam_id)
+    try:
+        if after is not None:
+            after_score, after_time, after_user_id = after[:3]
+            pipe = client.pipeline(transaction=False)
+            pipe.zscore(rank_key, _member(after_user_id))
+            pipe.zrank(rank_key, _member(after_user_id))
+            score, rank = pipe.execute()
+            if score is None or score != _sort_key(after_score, after_time):
+                return None
+            start = rank + 1
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hgetall(meta_key)
+        pipe.zrange(rank_key, start, start + count - 1)
+        raw_meta, members = pipe.execute()
+        if not raw_meta:
+            return None
+
+        payloads = client.hmget(entries_key, [int(m) for m in members]) if members else []
+    except RedisError as exc:
+        logger.warning("Leaderboard store read failed for exam %s: %s", exam_id, exc)
+        return None
+
+    meta = {
+        "exam_title": raw_meta[b"exam_title"].decode(),
+        "participant_count": int(raw_meta[b"participant_count"]),
+    }
+    return meta, [json_provider.loads(p) for p in payloads if p is not None]
+
+
+def read_entry(exam_id: int, user_id: int) -> tuple[bool, Optional[bytes]]:
+    """
+    Look up one user's entry as its stored JSON bytes.
+
+    Returns (available, payload): `available` is False when the caller must
+    fall back to MySQL; otherwise `payload` is None for non-participants.
+    """
+    client = _client()
+    if client is None:
+        return False, None
+
+    _, entries_key, meta_key = _keys(exam_id)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(meta_key)
+        pipe.hget(entries_key, user_id)
+        built, payload = pipe.execute()
+    except RedisError as exc:
+        logger.warning("Leaderboard store read failed for exam %s: %s", exam_id, exc)
+        return False, None
+
+    if not built:
+        return False, None
+    return True, payload
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# HELPERS
+# ────────────────────────────────────────────────────────────────────────────
+
+def _client():
+    """The raw redis-py client behind Flask-Caching, or None if not Redis."""
+    return getattr(cache.cache, "_write_client", None)
+
+
+def _keys(exam_id: int) -> tuple[str, str, str]:
+    return f"lb:{exam_id}:rank", f"lb:{exam_id}:entries", f"lb:{exam_id}:meta"
+
+
+def _member(user_id: int) -> str:
+    # Zero-padded so lexicographic tie order equals numeric user_id order
+    return f"{user_id:0{_MEMBER_WIDTH}d}"
+
+
+def _sort_key(total_score: float, total_time_sec: int) -> float:
+    return -float(round(total_score * _SCORE_SCALE) * _TIME_SPAN - total_time_sec)
@@ -0,0 +1,58 @@
+"""
+Rank Tasks — deferred leaderboard recalculation on the Celery queue
+
+Finishing a session or submitting a score changes one row, but re-ranking
+the exam is O(participants).  PATCH /sessions/<id>/finish and POST /scores
+therefore commit, queue `refresh_ranks` and return; a worker re-ranks,
+pre-renders the default first page and invalidates the cache.
+
+    celery -A celery_worker.celery worker
+
+A burst of finishes for one exam coalesces into a single job: the first
+caller sets a short-lived "pending" key and enqueues, later callers see
+the key and skip.  The job clears the key *before* reading, so any finish
+committed after the job started queues another run and is never lost.
+
+In development / testing (CELERY_TASK_ALWAYS_EAGER) the job runs inline.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from flask import current_app
+from kombu.exceptions import OperationalError as BrokerError
+
+from app.extensions import cache, celery
+from app.services import scoring_engine
+
+logger = logging.getLogger(__name__)
+
+
+def schedule_rank_refresh(exam_id: int) -> None:
+    """Queue a rank recalculation for the exam unless one is already pending."""
+    if not cache.add(_pending_key(exam_id), 1, timeout=current_app.config["RANK_REFRESH_DEBOUNCE_SEC"]):
+        return
+
+    try:
+        refresh_ranks.delay(exam_id)
+    except BrokerError as exc:
+        # Broker unreachable — re-rank inline rather than leave ranks stale
+        logger.warning("Rank refresh not queued for exam %s: %s", exam_id, exc)
+        refresh_ranks(exam_id)
+
+
+@celery.task(name="leaderboard.refresh_ranks")
+def refresh_ranks(exam_id: int) -> None:
+    """Re-rank every entry for the exam and invalidate its caches."""
+    # Imported here: the API module imports the scoring engine, which
+    # imports this module
+    from app.api.leaderboard import prewarm_first_page
+
+    cache.delete(_pending_key(exam_id))
+    scoring_engine.recalculate_all_ranks(exam_id)
+    scoring_engine._invalidate_leaderboard_cache(exam_id, prewarm=prewarm_first_page)
+
+
+def _pending_key(exam_id: int) -> str:
+    return f"leaderboard:exam:{exam_id}:rank_pending"
@@ -6,39 +6,155 @@ Architecture:
      module_scores row is upserted with optimistic locking.
   2. A transactional post-hook recalculates the weighted total and updates the
      leaderboard_snapshot table inside the SAME database transaction.
-  3. Ranks are recomputed for the entire exam using DENSE_RANK ordered by
-     (total_score DESC, total_time_sec ASC) — the tie-breaker.
-  4. Redis cache for GET /leaderboard is invalidated so the next read fetches
-     fresh data.
+  3. The submitter's own DENSE_RANK, ordered by (total_score DESC,
+     total_time_sec ASC) — the tie-breaker — is computed in the same
+     transaction, so the response carries the exact rank.
+  4. After commit a debounced background job (rank_tasks) re-ranks the
+     whole exam, materialising the analytics columns and `exam_stats`,
+     then rebuilds the Redis sorted set and invalidates the GET
+     /leaderboard cache.  Every other row's rank and z-score can shift, so
+     that O(N) rewrite is kept out of the score transaction.
+  5. The audit row is queued after commit too (audit_log) and batch-inserted
+     by a background job, keeping its INSERT out of the critical section.
 
 Concurrency Controls:
-  • SERIALIZABLE isolation for score writes → prevents phantom reads.
-  • Optimistic locking via `version` column → detects and retries on conflicts.
-  • SELECT … FOR UPDATE on the session row → prevents two concurrent module
-    submissions from producing inconsistent totals.
+  • READ COMMITTED (the engine default) — no gap/range locks on score writes.
+  • Optimistic locking via `version` columns → every write is an
+    UPDATE … WHERE version = :read_version; zero rows means a concurrent
+    writer won, and the whole transaction is retried.
+  • Bumping the session's version first serialises concurrent module
+    submissions for one session, so totals are never computed from a
+    stale set of module scores.
 """
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import random
+import time
 from datetime import datetime, timezone
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional
+from typing import Callable, Iterable, NamedTuple, Optional, TypeVar
 
-from sqlalchemy import text, select, update
-from sqlalchemy.exc import OperationalError
+import orjson
+from flask import current_app
+from sqlalchemy import and_, bindparam, event, func, inspect, or_, text, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.extensions import db, cache
-from app.models import (
-    Exam, ExamSession, ModuleScore,
-    LeaderboardSnapshot, ScoreAuditLog,
-)
+from app.services import audit_log, leaderboard_store, rank_tasks
+from app.models import Exam, ExamSession, ModuleScore, LeaderboardSnapshot
 
 logger = logging.getLogger(__name__)
 
+
+class IdempotencyKeyReused(ValueError):
+    """An Idempotency-Key was replayed with a different submission."""
+
+
+class IdempotencyKeyInFlight(RuntimeError):
+    """An Idempotency-Key was replayed while its first submission is still running."""
+
+
+class _ModuleValues(NamedTuple):
+    """The fields of a module score that the weighted total depends on."""
+    module_type: str
+    raw_score: float
+    time_spent_sec: int
+
+
 # Maximum retries on optimistic-lock conflicts
 MAX_RETRIES = 3
 
+# MySQL errors that mean "lost a race, try again": lock wait timeout,
+# deadlock, and a duplicate key
+# from two first-time submissions of the same module.
+_RETRYABLE_MYSQL_ERRORS = {1205, 1213, 1062}
+
+# Fixed-point scale for score arithmetic (NUMERIC(10,4) → 4 decimals)
+_SCORE_SCALE = 10_000
+
+# Full-jitter exponential backoff between retries: sleep U(0, min(cap, base·2^n))
+BACKOFF_BASE_MS = 10
+BACKOFF_CAP_MS = 1000
+
+_WEIGHT_COLUMNS = (
+    "weight_coding", "weight_quiz", "weight_assessment",
+    "max_score_coding", "max_score_quiz", "max_score_assessment",
+)
+_EXAM_WEIGHTS_STMT = select(
+    *(getattr(Exam, name) for name in _WEIGHT_COLUMNS)
+).where(Exam.exam_id == bindparam("exam_id"))
+
+# The user's own row is excluded, so the rank can be taken before their
+# snapshot is written (their old key may rank above the new one).
+_KEYS_AHEAD = (
+    select(LeaderboardSnapshot.total_score, LeaderboardSnapshot.total_time_sec)
+    .where(
+        LeaderboardSnapshot.exam_id == bindparam("exam_id"),
+        LeaderboardSnapshot.user_id != bindparam("user_id"),
+        or_(
+            LeaderboardSnapshot.total_score > bindparam("total_score"),
+            and_(
+                LeaderboardSnapshot.total_score == bindparam("total_score"),
+                LeaderboardSnapshot.total_time_sec < bindparam("total_time_sec"),
+            ),
+        ),
+    )
+    .distinct()
+    .subquery()
+)
+_DENSE_RANK_STMT = select(func.count() + 1).select_from(_KEYS_AHEAD)
+
+# The submitter's snapshot as last written, read before the upsert: when
+# the recalculated values match it no rank or aggregate can move
+_WEIGHTED_COLUMNS = (
+    "weighted_coding", "weighted_quiz", "weighted_assessment",
+    "total_score", "total_time_sec",
+)
+_PREVIOUS_SNAPSHOT_STMT = select(
+    *(getattr(LeaderboardSnapshot, name) for name in _WEIGHTED_COLUMNS)
+).where(
+    LeaderboardSnapshot.exam_id == bindparam("exam_id"),
+    LeaderboardSnapshot.user_id == bindparam("user_id"),
+)
+
+# Bulk submissions: sessions locked in key order, plus the module values
+# their totals are recalculated from
+_LOCK_SESSIONS_STMT = (
+    select(ExamSession.session_id, ExamSession.exam_id, ExamSession.user_id)
+    .where(ExamSession.session_id.in_(bindparam("session_ids", expanding=True)))
+    .order_by(ExamSession.session_id)
+    .with_for_update()
+)
+_MODULE_VALUES_STMT = select(
+    ModuleScore.session_id, ModuleScore.module_type,
+    ModuleScore.raw_score, ModuleScore.time_spent_sec,
+).where(ModuleScore.session_id.in_(bindparam("session_ids", expanding=True)))
+
+_UPSERT_MODULE_SCORE_STMT = mysql_insert(ModuleScore)
+_UPSERT_MODULE_SCORE_STMT = _UPSERT_MODULE_SCORE_STMT.on_duplicate_key_update({
+    **{
+        name: _UPSERT_MODULE_SCORE_STMT.inserted[name]
+        for name in ("raw_score", "max_score", "time_spent_sec", "details")
+    },
+    "version": ModuleScore.version + 1,
+})
+
+# Columns a score submission rewrites; the analytics columns keep their
+# defaults on insert and are left for the deferred re-rank on update.
+_SNAPSHOT_SCORE_COLUMNS = (
+    "weighted_coding", "weighted_quiz", "weighted_assessment",
+    "total_score", "total_time_sec", "rank_position", "last_calculated_at",
+)
+_UPSERT_SNAPSHOT_STMT = mysql_insert(LeaderboardSnapshot)
+_UPSERT_SNAPSHOT_STMT = _UPSERT_SNAPSHOT_STMT.on_duplicate_key_update({
+    name: _UPSERT_SNAPSHOT_STMT.inserted[name] for name in _SNAPSHOT_SCORE_COLUMNS
+})
+
 
 # ────────────────────────────────────────────────────────────────────────────
 # PUBLIC API
@@ -52,22 +168,44 @@ def submit_module_score(
     time_spent_sec: int,
     details: Optional[dict] = None,
     changed_by: int = 0,      # user_id performing the update
+    idempotency_key: Optional[str] = None,
 ) -> dict:
     """
     Atomically upsert a module score, recalculate weighted totals,
     refresh rank positions, and invalidate cache.
 
-    Returns a summary dict with the new leaderboard entry.
+    Returns a summary dict with the new leaderboard entry.  A repeated
+    `idempotency_key` (e.g. a client retrying after a timeout) for the
+    same session and module within IDEMPOTENCY_TTL_SEC returns the first
+    call's result without re-applying the submission or writing another
+    audit row.  The replay is only served for an identical payload.  The
+    key is reserved before the transaction runs, so of two concurrent
+    retries only one applies the score.
 
     Raises:
+        IdempotencyKeyReused – if the key was used with a different payload
+        IdempotencyKeyInFlight – if the key's first submission has not finished
         ValueError  – on invalid input
         RuntimeError – if optimistic lock fails after MAX_RETRIES
     """
     _validate_module_type(module_type)
-
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            result = _atomic_score_update(
+    _validate_score(raw_score, max_score, time_spent_sec)
+
+    idem_key = fingerprint = None
+    if idempotency_key:
+        idem_key = f"idem:scores:{session_id}:{module_type}:{idempotency_key}"
+        fingerprint = _payload_fingerprint(raw_score, max_score, time_spent_sec, details)
+        # SET NX: the first request claims the key; a retry racing it finds
+        # the reservation instead of also missing and applying the score
+        if not cache.add(
+            idem_key, {"fingerprint": fingerprint, "pending": True},
+            timeout=current_app.config["IDEMPOTENCY_TTL_SEC"],
+        ):
+            return _idempotent_replay(cache.get(idem_key), fingerprint)
+
+    try:
+        result = _with_retries(
+            lambda: _atomic_score_update(
                 session_id=session_id,
                 module_type=module_type,
                 raw_score=raw_score,
@@ -75,35 +213,84 @@ def submit_module_score(
                 time_spent_sec=time_spent_sec,
                 details=details,
                 changed_by=changed_by,
-            )
-            return result
+            ),
+            f"session {session_id}, module {module_type}",
+        )
+    except Exception:
+        # Nothing was applied: release the key so the client can retry
+        if idem_key is not None:
+            cache.delete(idem_key)
+        raise
+
+    if idem_key is not None:
+        cache.set(
+            idem_key, {"fingerprint": fingerprint, "result": result},
+            timeout=current_app.config["IDEMPOTENCY_TTL_SEC"],
+        )
+    return result
 
-        except OperationalError as exc:
-            # Deadlock or lock-wait timeout — retry
-            db.session.rollback()
-            logger.warning(
-                "Optimistic lock conflict (attempt %d/%d) session=%s module=%s: %s",
-                attempt, MAX_RETRIES, session_id, module_type, exc,
-            )
-            if attempt == MAX_RETRIES:
-                raise RuntimeError(
-                    f"Could not acquire lock after {MAX_RETRIES} retries "
-                    f"for session {session_id}, module {module_type}"
-                ) from exc
+
+def submit_module_scores_bulk(submissions: list[dict], changed_by: int = 0) -> int:
+    """
+    Apply many module submissions in one transaction — for imports, batch
+    grading and tests, where per-row submit_module_score calls would each
+    pay a full transaction, rank and cache invalidation.
+
+    Each dict carries submit_module_score's arguments (session_id,
+    module_type, raw_score, max_score, time_spent_sec, optional details);
+    a later entry for the same session and module wins.  Ranks are
+    recalculated and caches invalidated once per affected exam, before
+    returning.
+
+    Returns the number of module scores written.
+
+    Raises:
+        ValueError  – on invalid input or an unknown session
+        RuntimeError – if the transaction conflicts MAX_RETRIES times
+    """
+    rows = {}
+    for sub in submissions:
+        _validate_module_type(sub["module_type"])
+        _validate_score(sub["raw_score"], sub["max_score"], sub["time_spent_sec"])
+        rows[(sub["session_id"], sub["module_type"])] = {
+            "session_id": sub["session_id"],
+            "module_type": sub["module_type"],
+            "raw_score": sub["raw_score"],
+            "max_score": sub["max_score"],
+            "time_spent_sec": sub["time_spent_sec"],
+            "details": sub.get("details"),
+        }
+    if not rows:
+        return 0
+
+    rows = list(rows.values())
+    old_scores = _with_retries(
+        lambda: _atomic_bulk_update(rows), f"bulk submission of {len(rows)} scores",
+    )
+
+    for row in rows:
+        audit_log.record(
+            row["session_id"], row["module_type"],
+            old_scores.get((row["session_id"], row["module_type"])),
+            row["raw_score"], changed_by,
+        )
+    return len(rows)
 
 
 def recalculate_all_ranks(exam_id: int) -> int:
     """
     Full rank recalculation for an exam.  Useful after bulk imports or
-    manual score adjustments.
+    manual score adjustments.  Commits the refreshed ranks and stats.
 
     Returns the number of entries updated.
     """
-    return _refresh_ranks(exam_id)
+    updated = _refresh_ranks(exam_id)
+    db.session.commit()
+    return updated
 
 
 # ────────────────────────────────────────────────────────────────────────────
-# INTERNAL — runs inside a single SERIALIZABLE transaction
+# INTERNAL — runs inside a single transaction
 # ────────────────────────────────────────────────────────────────────────────
 
 def _atomic_score_update(
@@ -117,29 +304,36 @@ def _atomic_score_update(
 ) -> dict:
     """Execute the full score-update pipeline in one transaction."""
 
-    # ── Step 1: Lock the session row (SELECT … FOR UPDATE) ─────────────
+    # ── Step 1: Load the session and claim it (optimistic lock) ────────
+    # One row with at most three modules: a LEFT JOIN fetches both in a
+    # single round trip (selectinload would issue a second IN query).
     session: ExamSession = (
         db.session.execute(
             select(ExamSession)
             .where(ExamSession.session_id == session_id)
-            .with_for_update()
+            .options(joinedload(ExamSession.module_scores))
         )
+        .unique()
         .scalar_one()
     )
 
-    exam: Exam = db.session.get(Exam, session.exam_id)
+    exam_id = session.exam_id
 
-    # ── Step 2: Upsert module score with optimistic lock ───────────────
-    module_score: ModuleScore | None = (
-        db.session.execute(
-            select(ModuleScore)
-            .where(
-                ModuleScore.session_id == session_id,
-                ModuleScore.module_type == module_type,
-            )
-            .with_for_update()
+    # A concurrent submission for this session blocks on the row lock this
+    # UPDATE takes, then matches no row once we commit and retries.
+    _check_rowcount(db.session.execute(
+        update(ExamSession)
+        .where(
+            ExamSession.session_id == session_id,
+            ExamSession.version == session.version,
         )
-        .scalar_one_or_none()
+        .values(version=session.version + 1)
+    ), "exam_sessions", session_id)
+
+    # ── Step 2: Upsert module score with optimistic lock ───────────────
+    module_score: ModuleScore | None = next(
+        (ms for ms in session.module_scores if ms.module_type == module_type),
+        None,
     )
 
     old_score = float(module_score.raw_score) if module_score else None
@@ -155,61 +349,195 @@ def _atomic_score_update(
             details=details,
             version=1,
         )
-        db.session.add(module_score)
+        # Through the relationship, so the collection loaded with the
+        # session (and summed in step 3) includes the new module; a racing
+        # first submission fails on uq_session_module and retries.
+        session.module_scores.append(module_score)
     else:
-        # Update existing — bump version (optimistic lock)
-        module_score.raw_score = raw_score
-        module_score.max_score = max_score
-        module_score.time_spent_sec = time_spent_sec
-        module_score.details = details
-        module_score.version += 1
-        module_score.updated_at = datetime.now(timezone.utc)
-
-    # ── Step 3: Write audit log ────────────────────────────────────────
-    audit = ScoreAuditLog(
-        session_id=session_id,
-        module_type=module_type,
-        old_score=old_score,
-        new_score=raw_score,
-        changed_by=changed_by,
-        change_reason="module_submission",
+        # Update existing — only if its version is still the one we read.
+        # The ORM-enabled UPDATE also refreshes the loaded instance.
+        _check_rowcount(db.session.execute(
+            update(ModuleScore)
+            .where(
+                ModuleScore.session_id == session_id,
+                ModuleScore.module_type == module_type,
+                ModuleScore.version == module_score.version,
+            )
+            .values(
+                raw_score=raw_score,
+                max_score=max_score,
+                time_spent_sec=time_spent_sec,
+                details=details,
+                version=module_score.version + 1,
+            )
+        ), "module_scores", session_id)
+
+    # ── Step 3: Recalculate weighted total for THIS session ────────────
+    weighted = _calculate_weighted_score(session.module_scores, _exam_weights(exam_id))
+
+    # ── Step 4: Rank THIS entry ────────────────────────────────────────
+    # DENSE_RANK of one row = distinct (score, time) keys of the other
+    # participants ahead of it + 1; an index range read, so the
+    # transaction writes no other rows.
+    rank = db.session.execute(_DENSE_RANK_STMT, {
+        "exam_id": exam_id,
+        "user_id": session.user_id,
+        "total_score": weighted["total_score"],
+        "total_time_sec": weighted["total_time_sec"],
+    }).scalar_one()
+
+    # ── Step 5: Upsert leaderboard snapshot, rank included ─────────────
+    # Compared on the computed values, not the module inputs: an identical
+    # re-submit after an exam weight change still moves the total.
+    previous = db.session.execute(_PREVIOUS_SNAPSHOT_STMT, {
+        "exam_id": exam_id, "user_id": session.user_id,
+    }).first()
+    ranking_unchanged = previous is not None and tuple(previous) == tuple(
+        weighted[name] for name in _WEIGHTED_COLUMNS
     )
-    db.session.add(audit)
+    entry = _upsert_leaderboard(session, weighted, rank)
 
-    # ── Step 4: Recalculate weighted total for THIS session ────────────
-    weighted = _calculate_weighted_score(session, exam)
+    # ── Step 6: Commit, then re-rank and audit off the txn ─────────────
+    db.session.commit()
+    if not ranking_unchanged:
+        rank_tasks.schedule_rank_refresh(exam_id)
+    audit_log.record(session_id, module_type, old_score, raw_score, changed_by)
 
-    # ── Step 5: Upsert leaderboard snapshot ────────────────────────────
-    lb_entry = _upsert_leaderboard(session, exam, weighted)
+    return entry
 
-    # ── Step 6: Refresh ranks for the entire exam ──────────────────────
-    db.session.flush()  # ensure all writes are visible within txn
-    _refresh_ranks(exam.exam_id)
 
-    # ── Step 7: Commit and invalidate cache ────────────────────────────
-    db.session.commit()
-    _invalidate_leaderboard_cache(exam.exam_id)
+def _atomic_bulk_update(rows: list[dict]) -> dict[tuple[int, str], float]:
+    """
+    Execute a bulk submission in one transaction and invalidate the caches
+    of every exam it touched.  Returns the previous raw score of each
+    (session_id, module_type) that already had one, for the audit log.
+    """
+    session_ids = sorted({row["session_id"] for row in rows})
 
-    # Re-read final rank after commit
-    lb_entry = (
-        db.session.execute(
-            select(LeaderboardSnapshot)
-            .where(
-                LeaderboardSnapshot.exam_id == exam.exam_id,
-                LeaderboardSnapshot.user_id == session.user_id,
-            )
+    # ── Step 1: Lock the sessions, in key order so bulk runs can't deadlock
+    sessions = {
+        s.session_id: s
+        for s in db.session.execute(_LOCK_SESSIONS_STMT, {"session_ids": session_ids})
+    }
+    missing = set(session_ids) - sessions.keys()
+    if missing:
+        db.session.rollback()
+        raise ValueError(f"Unknown session_id(s): {sorted(missing)}")
+
+    # ── Step 2: Current module values, merged with the submissions ─────
+    modules: dict[int, dict[str, _ModuleValues]] = {sid: {} for sid in session_ids}
+    old_scores = {}
+    for ms in db.session.execute(_MODULE_VALUES_STMT, {"session_ids": session_ids}):
+        modules[ms.session_id][ms.module_type] = _ModuleValues(
+            ms.module_type, ms.raw_score, ms.time_spent_sec,
         )
-        .scalar_one()
+        old_scores[(ms.session_id, ms.module_type)] = ms.raw_score
+    for row in rows:
+        modules[row["session_id"]][row["module_type"]] = _ModuleValues(
+            row["module_type"], row["raw_score"], row["time_spent_sec"],
+        )
+
+    # ── Step 3: Upsert the module scores; bump every session's version ─
+    # The version bump makes any single submission that read a session
+    # before this commit fail its optimistic check and retry.
+    db.session.execute(_UPSERT_MODULE_SCORE_STMT, rows)
+    db.session.execute(
+        update(ExamSession)
+        .where(ExamSession.session_id.in_(session_ids))
+        .values(version=ExamSession.version + 1)
+        .execution_options(synchronize_session=False)
     )
 
-    return _serialise_leaderboard_entry(lb_entry)
+    # ── Step 4: Recalculate totals and upsert the snapshots ────────────
+    now = datetime.now(timezone.utc)
+    snapshots = []
+    for sid, session in sessions.items():
+        weighted = _calculate_weighted_score(
+            modules[sid].values(), _exam_weights(session.exam_id),
+        )
+        snapshots.append({
+            "exam_id": session.exam_id,
+            "user_id": session.user_id,
+            "session_id": sid,
+            **weighted,
+            "rank_position": 0,  # set by _refresh_ranks below
+            "last_calculated_at": now,
+        })
+    db.session.execute(_UPSERT_SNAPSHOT_STMT, snapshots)
+
+    # ── Step 5: One re-rank per exam, commit, then invalidate ──────────
+    exam_ids = sorted({session.exam_id for session in sessions.values()})
+    for exam_id in exam_ids:
+        _refresh_ranks(exam_id)
+    db.session.commit()
+    for exam_id in exam_ids:
+        _invalidate_leaderboard_cache(exam_id)
+
+    return old_scores
 
 
 # ────────────────────────────────────────────────────────────────────────────
 # SCORING ALGORITHM
 # ────────────────────────────────────────────────────────────────────────────
 
-def _calculate_weighted_score(session: ExamSession, exam: Exam) -> dict:
+def _exam_weights(exam_id: int) -> tuple[dict[str, int], dict[str, int]]:
+    """
+    The exam's (weight_map, max_map) pre-scaled for _calculate_weighted_score:
+    weights ×10², max scores ×10⁴.
+
+    Weights and maxima are fixed once an exam is running, so they are cached
+    for EXAM_WEIGHTS_CACHE_TTL seconds and submissions skip the Exam read.
+    An ORM edit drops the entry when it commits (_drop_stale_exam_weights);
+    an edit made outside the ORM must delete the key itself.
+    """
+    key = _exam_weights_key(exam_id)
+    weights = cache.get(key)
+    if weights is None:
+        row = db.session.execute(_EXAM_WEIGHTS_STMT, {"exam_id": exam_id}).one()
+        weights = (
+            {
+                "coding":     round(row.weight_coding * 100),
+                "quiz":       round(row.weight_quiz * 100),
+                "assessment": round(row.weight_assessment * 100),
+            },
+            {
+                "coding":     round(row.max_score_coding * _SCORE_SCALE),
+                "quiz":       round(row.max_score_quiz * _SCORE_SCALE),
+                "assessment": round(row.max_score_assessment * _SCORE_SCALE),
+            },
+        )
+        cache.set(key, weights, timeout=current_app.config["EXAM_WEIGHTS_CACHE_TTL"])
+    return weights
+
+
+def _exam_weights_key(exam_id: int) -> str:
+    return f"exam:{exam_id}:weights"
+
+
+@event.listens_for(Exam, "after_update")
+def _note_exam_weights_change(mapper, connection, exam: Exam) -> None:
+    """Remember, on the ORM session, exams whose weights or maxima changed."""
+    state = inspect(exam)
+    if any(state.attrs[name].history.has_changes() for name in _WEIGHT_COLUMNS):
+        state.session.info.setdefault("stale_exam_weights", set()).add(exam.exam_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_exam_weights(session: Session) -> None:
+    """Evict cached weights only once the edit is committed and visible."""
+    for exam_id in session.info.pop("stale_exam_weights", ()):
+        cache.delete(_exam_weights_key(exam_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_exam_weights(session: Session) -> None:
+    session.info.pop("stale_exam_weights", None)
+
+
+def _calculate_weighted_score(
+    module_scores: Iterable[ModuleScore | _ModuleValues],
+    exam_weights: tuple[dict[str, int], dict[str, int]],
+) -> dict:
     """
     Weighted Scoring Formula
     ────────────────────────
@@ -221,98 +549,132 @@ def _calculate_weighted_score(session: ExamSession, exam: Exam) -> dict:
     Total Score = Σ weighted_m   (range: 0..100)
 
     Tie-breaker: lowest total_time_sec wins.
-    """
 
-    weight_map = {
-        "coding":     Decimal(str(exam.weight_coding)),
-        "quiz":       Decimal(str(exam.weight_quiz)),
-        "assessment": Decimal(str(exam.weight_assessment)),
-    }
+    Computed in exact scaled integers (scores ×10⁴, weights ×10², results
+    in units of 10⁻⁴) with ROUND_HALF_UP to 4 decimals, matching the
+    NUMERIC(10,4) columns without building Decimal objects.
+    """
 
-    max_map = {
-        "coding":     Decimal(str(exam.max_score_coding)),
-        "quiz":       Decimal(str(exam.max_score_quiz)),
-        "assessment": Decimal(str(exam.max_score_assessment)),
-    }
+    weight_map, max_map = exam_weights
 
-    scores: dict[str, ModuleScore] = {
-        ms.module_type: ms for ms in session.module_scores
-    }
+    scores = {ms.module_type: ms for ms in module_scores}
 
     result = {}
-    total = Decimal("0")
+    total = 0
     total_time = 0
 
     for module in ("coding", "quiz", "assessment"):
         ms = scores.get(module)
-        if ms and max_map[module] > 0:
-            normalised = Decimal(str(ms.raw_score)) / max_map[module]
-            weighted = (normalised * weight_map[module]).quantize(
-                Decimal("0.0001"), rounding=ROUND_HALF_UP
-            )
+        max_scaled = max_map[module]
+        if ms and max_scaled > 0:
+            # raw/max × weight in 10⁻⁴ units = raw·w·100 / max, rounded half up
+            numerator = round(ms.raw_score * _SCORE_SCALE) * weight_map[module] * 100
+            weighted = (2 * numerator + max_scaled) // (2 * max_scaled)
             total_time += ms.time_spent_sec
         else:
-            weighted = Decimal("0.0000")
+            weighted = 0
 
-        result[f"weighted_{module}"] = weighted
+        result[f"weighted_{module}"] = weighted / _SCORE_SCALE
         total += weighted
 
-    result["total_score"] = total.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+    result["total_score"] = total / _SCORE_SCALE
     result["total_time_sec"] = total_time
 
     return result
 
 
-def _upsert_leaderboard(
-    session: ExamSession,
-    exam: Exam,
-    weighted: dict,
-) -> LeaderboardSnapshot:
-    """Insert or update the leaderboard snapshot row for this user+exam."""
-
-    lb_entry: LeaderboardSnapshot | None = (
-        db.session.execute(
-            select(LeaderboardSnapshot)
-            .where(
-                LeaderboardSnapshot.exam_id == exam.exam_id,
-                LeaderboardSnapshot.user_id == session.user_id,
-            )
-            .with_for_update()
-        )
-        .scalar_one_or_none()
-    )
-
-    now = datetime.now(timezone.utc)
-
-    if lb_entry is None:
-        lb_entry = LeaderboardSnapshot(
-            exam_id=exam.exam_id,
-            user_id=session.user_id,
-            session_id=session.session_id,
-            weighted_coding=weighted["weighted_coding"],
-            weighted_quiz=weighted["weighted_quiz"],
-            weighted_assessment=weighted["weighted_assessment"],
-            total_score=weighted["total_score"],
-            total_time_sec=weighted["total_time_sec"],
-            rank_position=0,  # will be set by _refresh_ranks
-            last_calculated_at=now,
-        )
-        db.session.add(lb_entry)
-    else:
-        lb_entry.weighted_coding = weighted["weighted_coding"]
-        lb_entry.weighted_quiz = weighted["weighted_quiz"]
-        lb_entry.weighted_assessment = weighted["weighted_assessment"]
-        lb_entry.total_score = weighted["total_score"]
-        lb_entry.total_time_sec = weighted["total_time_sec"]
-        lb_entry.last_calculated_at = now
-
-    return lb_entry
+def _upsert_leaderboard(session: ExamSession, weighted: dict, rank: int) -> dict:
+    """
+    Insert or update the snapshot row for this user+exam in one
+    INSERT … ON DUPLICATE KEY UPDATE on uq_lb_exam_user — no locking read
+    first — and return the leaderboard entry it wrote.
+    """
+    row = {
+        "exam_id": session.exam_id,
+        "user_id": session.user_id,
+        "session_id": session.session_id,
+        "weighted_coding": weighted["weighted_coding"],
+        "weighted_quiz": weighted["weighted_quiz"],
+        "weighted_assessment": weighted["weighted_assessment"],
+        "total_score": weighted["total_score"],
+        "total_time_sec": weighted["total_time_sec"],
+        "rank_position": rank,
+        "last_calculated_at": datetime.now(timezone.utc),
+    }
+    db.session.execute(_UPSERT_SNAPSHOT_STMT, row)
+    return _serialise_leaderboard_entry(row)
 
 
 # ────────────────────────────────────────────────────────────────────────────
 # RANK REFRESH  — DENSE_RANK with tie-breaker
 # ────────────────────────────────────────────────────────────────────────────
 
+# Use a raw SQL UPDATE with window-function subquery for performance.
+# MySQL 8+ supports window functions inside derived tables.
+_REFRESH_RANKS_SQL = text("""
+    UPDATE leaderboard_snapshot AS lb
+    INNER JOIN (
+        SELECT snapshot_id,
+               DENSE_RANK() OVER w_score                    AS new_rank,
+               RANK() OVER w_score                          AS standard_rank,
+               ROUND(PERCENT_RANK() OVER w_score * 100, 2) AS percentile_rank,
+               NTILE(4) OVER w_score                        AS quartile,
+               NTILE(10) OVER w_score                       AS decile,
+
+               ROUND(AVG(total_score) OVER (
+                   ORDER BY total_score DESC
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+               ), 4)                                        AS running_avg,
+
+               ROUND(
+                   CASE WHEN STDDEV_POP(total_score) OVER () > 0
+                        THEN (total_score - AVG(total_score) OVER ())
+                             / STDDEV_POP(total_score) OVER ()
+                        ELSE 0
+                   END, 4
+               )                                            AS z_score,
+
+               DENSE_RANK() OVER (ORDER BY weighted_coding DESC)     AS coding_rank,
+               DENSE_RANK() OVER (ORDER BY weighted_quiz DESC)       AS quiz_rank,
+               DENSE_RANK() OVER (ORDER BY weighted_assessment DESC) AS assessment_rank,
+               DENSE_RANK() OVER (ORDER BY total_time_sec ASC)       AS speed_rank,
+
+               CASE
+                   WHEN PERCENT_RANK() OVER w_score >= 0.90 THEN 'Outstanding'
+                   WHEN PERCENT_RANK() OVER w_score >= 0.75 THEN 'Excellent'
+                   WHEN PERCENT_RANK() OVER w_score >= 0.50 THEN 'Good'
+                   WHEN PERCENT_RANK() OVER w_score >= 0.25 THEN 'Average'
+                   ELSE 'Needs Improvement'
+               END                                          AS performance_tier
+        FROM   leaderboard_snapshot
+        WHERE  exam_id = :exam_id
+        WINDOW w_score AS (ORDER BY total_score DESC, total_time_sec ASC)
+    ) AS ranked ON lb.snapshot_id = ranked.snapshot_id
+    SET lb.rank_position    = ranked.new_rank,
+        lb.standard_rank    = ranked.standard_rank,
+        lb.percentile_rank  = ranked.percentile_rank,
+        lb.quartile         = ranked.quartile,
+        lb.decile           = ranked.decile,
+        lb.running_avg      = ranked.running_avg,
+        lb.z_score          = ranked.z_score,
+        lb.coding_rank      = ranked.coding_rank,
+        lb.quiz_rank        = ranked.quiz_rank,
+        lb.assessment_rank  = ranked.assessment_rank,
+        lb.speed_rank       = ranked.speed_rank,
+        lb.performance_tier = ranked.performance_tier,
+        lb.last_calculated_at = :now
+    WHERE lb.exam_id = :exam_id
+      -- Skip rows whose materialised values are already current (their
+      -- last_calculated_at keeps the time they last actually changed)
+      AND (lb.rank_position, lb.standard_rank, lb.percentile_rank, lb.quartile,
+           lb.decile, lb.running_avg, lb.z_score, lb.coding_rank, lb.quiz_rank,
+           lb.assessment_rank, lb.speed_rank, lb.performance_tier)
+       <> (ranked.new_rank, ranked.standard_rank, ranked.percentile_rank, ranked.quartile,
+           ranked.decile, ranked.running_avg, ranked.z_score, ranked.coding_rank, ranked.quiz_rank,
+           ranked.assessment_rank, ranked.speed_rank, ranked.performance_tier)
+""")
+
+
 def _refresh_ranks(exam_id: int) -> int:
     """
     Recompute rank_position for every participant in an exam using:
@@ -322,39 +684,90 @@ def _refresh_ranks(exam_id: int) -> int:
                      total_time_sec ASC   -- tie-breaker
         )
 
-    Executes a single UPDATE … JOIN on the database for efficiency.
-    Returns: number of rows updated.
-    """
+    The same pass materialises the per-row analytics (percentile, quartile,
+    z-score, per-module ranks, tier, …) and the exam-wide aggregates in
+    `exam_stats`, so the analytics read path is plain column lookups.
 
-    # Use a raw SQL UPDATE with window-function subquery for performance.
-    # MySQL 8+ supports window functions inside derived tables.
-    sql = text("""
-        UPDATE leaderboard_snapshot AS lb
-        INNER JOIN (
-            SELECT snapshot_id,
-                   DENSE_RANK() OVER (
-                       ORDER BY total_score DESC,
-                                total_time_sec ASC
-                   ) AS new_rank
-            FROM   leaderboard_snapshot
-            WHERE  exam_id = :exam_id
-        ) AS ranked ON lb.snapshot_id = ranked.snapshot_id
-        SET lb.rank_position = ranked.new_rank
-        WHERE lb.exam_id = :exam_id
-    """)
-
-    result = db.session.execute(sql, {"exam_id": exam_id})
+    Executes a single UPDATE … JOIN on the database for efficiency; rows
+    whose values are already current are filtered out, so a score change
+    that moves one rank rewrites one row rather than the whole exam.
+    Returns: number of rows changed.
+    """
+    result = db.session.execute(
+        _REFRESH_RANKS_SQL, {"exam_id": exam_id, "now": datetime.now(timezone.utc)}
+    )
+    _refresh_exam_stats(exam_id)
     return result.rowcount
 
 
+_REFRESH_EXAM_STATS_SQL = text("""
+    INSERT INTO exam_stats (
+        exam_id, participant_count, avg_score, stddev_score,
+        pass_rate_pct, distinction_rate_pct, last_calculated_at
+    )
+    SELECT * FROM (
+        SELECT :exam_id                                     AS exam_id,
+               COUNT(*)                                     AS participant_count,
+               COALESCE(ROUND(AVG(total_score), 4), 0)      AS avg_score,
+               COALESCE(ROUND(STDDEV_POP(total_score), 4), 0) AS stddev_score,
+               COALESCE(ROUND(
+                   SUM(CASE WHEN total_score >= 40 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+               ), 0)                                        AS pass_rate_pct,
+               COALESCE(ROUND(
+                   SUM(CASE WHEN total_score >= 75 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+               ), 0)                                        AS distinction_rate_pct,
+               :now                                         AS last_calculated_at
+        FROM   leaderboard_snapshot
+        WHERE  exam_id = :exam_id
+    ) AS s
+    ON DUPLICATE KEY UPDATE
+        participant_count    = s.participant_count,
+        avg_score            = s.avg_score,
+        stddev_score         = s.stddev_score,
+        pass_rate_pct        = s.pass_rate_pct,
+        distinction_rate_pct = s.distinction_rate_pct,
+        last_calculated_at   = s.last_calculated_at
+""")
+
+
+def _refresh_exam_stats(exam_id: int) -> None:
+    """Upsert the exam-wide aggregates row in `exam_stats`."""
+    db.session.execute(
+        _REFRESH_EXAM_STATS_SQL, {"exam_id": exam_id, "now": datetime.now(timezone.utc)}
+    )
+
+
 # ────────────────────────────────────────────────────────────────────────────
 # CACHE INVALIDATION
 # ────────────────────────────────────────────────────────────────────────────
 
-def _invalidate_leaderboard_cache(exam_id: int) -> None:
-    """Delete the cached leaderboard so the next GET fetches fresh data."""
-    cache_key = f"leaderboard:exam:{exam_id}"
-    cache.delete(cache_key)
+def _leaderboard_cache_version(exam_id: int) -> int:
+    """Current cache version token for an exam (0 until first invalidation)."""
+    return cache.get(f"leaderboard:exam:{exam_id}:ver") or 0
+
+
+def _invalidate_leaderboard_cache(
+    exam_id: int,
+    prewarm: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """
+    Orphan every cached leaderboard page for an exam.
+
+    Page keys embed the exam's version token, so replacing the token makes
+    all of them unreachable in one write — no key scan, and stale pages
+    simply age out via their TTL.  A fresh time_ns() token (rather than
+    INCR) stays monotonic even if the token key itself is evicted.
+
+    The Redis sorted set is rebuilt first, so pages rendered under the new
+    token are read from the committed leaderboard.  `prewarm(exam_id,
+    token)`, if given, runs before the token is published, so readers
+    switching to it find those pages already cached.  Call after commit.
+    """
+    leaderboard_store.rebuild(exam_id)
+    version = time.time_ns()
+    if prewarm is not None:
+        prewarm(exam_id, version)
+    cache.set(f"leaderboard:exam:{exam_id}:ver", version, timeout=0)
     logger.info("Cache invalidated for exam %s", exam_id)
 
 
@@ -365,6 +778,55 @@ def _invalidate_leaderboard_cache(exam_id: int) -> None:
 _VALID_MODULES = {"coding", "quiz", "assessment"}
 
 
+_T = TypeVar("_T")
+
+
+def _with_retries(operation: Callable[[], _T], what: str) -> _T:
+    """
+    Run a score transaction, rolling back and retrying (with backoff) on
+    concurrency conflicts; any other error propagates.
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return operation()
+
+        except (OperationalError, IntegrityError, StaleDataError) as exc:
+            db.session.rollback()
+            if not _is_retryable(exc):
+                raise
+            logger.warning(
+                "Optimistic lock conflict (attempt %d/%d) %s: %s",
+                attempt, MAX_RETRIES, what, exc,
+            )
+            if attempt == MAX_RETRIES:
+                raise RuntimeError(
+                    f"Could not acquire lock after {MAX_RETRIES} retries for {what}"
+                ) from exc
+            time.sleep(_backoff_delay(attempt))
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """True for concurrency conflicts; anything else is a real error."""
+    if isinstance(exc, StaleDataError):
+        return True
+    code = getattr(exc.orig, "args", (None,))[0]
+    return code in _RETRYABLE_MYSQL_ERRORS
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Seconds to wait before retry `attempt + 1` (full jitter, from the first retry)."""
+    ceiling_ms = min(BACKOFF_CAP_MS, BACKOFF_BASE_MS * (1 << (attempt - 1)))
+    return random.uniform(0, ceiling_ms) / 1000.0
+
+
+def _check_rowcount(result, table: str, session_id: int) -> None:
+    """Raise the (retryable) StaleDataError if a version-checked UPDATE missed."""
+    if result.rowcount != 1:
+        raise StaleDataError(
+            f"{table} row for session {session_id} was modified concurrently"
+        )
+
+
 def _validate_module_type(module_type: str) -> None:
     if module_type not in _VALID_MODULES:
         raise ValueError(
@@ -372,15 +834,47 @@ def _validate_module_type(module_type: str) -> None:
         )
 
 
-def _serialise_leaderboard_entry(entry: LeaderboardSnapshot) -> dict:
+def _validate_score(raw_score: float, max_score: float, time_spent_sec: int) -> None:
+    # Mirrors SubmitScoreSchema for callers that bypass the API, so bad
+    # input fails before a transaction is opened (ck_modscore_raw_le_max
+    # would otherwise reject it only at flush).
+    if not 0 <= raw_score <= max_score:
+        raise ValueError(f"raw_score must be between 0 and max_score ({max_score})")
+    if time_spent_sec < 0:
+        raise ValueError("time_spent_sec cannot be negative")
+
+
+def _idempotent_replay(stored: Optional[dict], fingerprint: str) -> dict:
+    """The result stored under an already-claimed Idempotency-Key."""
+    if stored is not None and stored["fingerprint"] != fingerprint:
+        raise IdempotencyKeyReused(
+            "Idempotency-Key was already used with a different submission"
+        )
+    # Still reserved (or released by a failure since the claim was refused)
+    if stored is None or stored.get("pending"):
+        raise IdempotencyKeyInFlight(
+            "A submission with this Idempotency-Key is still in progress"
+        )
+    return stored["result"]
+
+
+def _payload_fingerprint(
+    raw_score: float, max_score: float, time_spent_sec: int, details: Optional[dict],
+) -> str:
+    """Digest of a submission's payload, stored with its idempotent replay."""
+    payload = [float(raw_score), float(max_score), int(time_spent_sec), details]
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _serialise_leaderboard_entry(row: dict) -> dict:
     return {
-        "exam_id": entry.exam_id,
-        "user_id": entry.user_id,
-        "rank": entry.rank_position,
-        "total_score": float(entry.total_score),
-        "weighted_coding": float(entry.weighted_coding),
-        "weighted_quiz": float(entry.weighted_quiz),
-        "weighted_assessment": float(entry.weighted_assessment),
-        "total_time_sec": entry.total_time_sec,
-        "last_calculated_at": entry.last_calculated_at.isoformat(),
+        "exam_id": row["exam_id"],
+        "user_id": row["user_id"],
+        "rank": row["rank_position"],
+        "total_score": row["total_score"],
+        "weighted_coding": row["weighted_coding"],
+        "weighted_quiz": row["weighted_quiz"],
+        "weighted_assessment": row["weighted_assessment"],
+        "total_time_sec": row["total_time_sec"],
+        "last_calculated_at": row["last_calculated_at"].isoformat(),
     }
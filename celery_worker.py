@@ -0,0 +1,18 @@
+"""
+Celery worker entry point.
+
+    celery -A celery_worker.celery worker --loglevel=info
+
+Tasks touch the database and cache through Flask extensions, so the
+worker process keeps one application context pushed for its lifetime.
+"""
+
+import os
+
+os.environ.setdefault("APP_ROLE", "worker")  # read by app.config at import
+
+from app import create_app  # noqa: E402
+from app.extensions import celery  # noqa: E402,F401 — the -A target
+
+app = create_app()
+app.app_context().push()
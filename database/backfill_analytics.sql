@@ -0,0 +1,92 @@
+-- ============================================================================
+-- BACKFILL: materialised analytics columns + exam_stats for existing rows
+-- Run once on a database whose leaderboard_snapshot rows predate the
+-- analytics columns (they read as their defaults until re-ranked).  Safe to
+-- re-run: it recomputes every exam from leaderboard_snapshot.
+-- ============================================================================
+
+USE leaderboard_db;
+
+-- ────────────────────────────────────────────────────────────────────────────
+-- 1. PER-ROW ANALYTICS — every exam in one pass
+--    (mirrors _REFRESH_RANKS_SQL in app/services/scoring_engine.py, with
+--     each window partitioned by exam_id)
+-- ────────────────────────────────────────────────────────────────────────────
+UPDATE leaderboard_snapshot AS lb
+INNER JOIN (
+    SELECT snapshot_id,
+           DENSE_RANK() OVER w_score                    AS new_rank,
+           RANK() OVER w_score                          AS standard_rank,
+           ROUND(PERCENT_RANK() OVER w_score * 100, 2) AS percentile_rank,
+           NTILE(4) OVER w_score                        AS quartile,
+           NTILE(10) OVER w_score                       AS decile,
+           ROUND(AVG(total_score) OVER (
+               PARTITION BY exam_id ORDER BY total_score DESC
+               ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+           ), 4)                                        AS running_avg,
+           ROUND(
+               CASE WHEN STDDEV_POP(total_score) OVER w_exam > 0
+                    THEN (total_score - AVG(total_score) OVER w_exam)
+                         / STDDEV_POP(total_score) OVER w_exam
+                    ELSE 0
+               END, 4
+           )                                            AS z_score,
+           DENSE_RANK() OVER (PARTITION BY exam_id ORDER BY weighted_coding DESC)     AS coding_rank,
+           DENSE_RANK() OVER (PARTITION BY exam_id ORDER BY weighted_quiz DESC)       AS quiz_rank,
+           DENSE_RANK() OVER (PARTITION BY exam_id ORDER BY weighted_assessment DESC) AS assessment_rank,
+           DENSE_RANK() OVER (PARTITION BY exam_id ORDER BY total_time_sec ASC)       AS speed_rank,
+           CASE
+               WHEN PERCENT_RANK() OVER w_score >= 0.90 THEN 'Outstanding'
+               WHEN PERCENT_RANK() OVER w_score >= 0.75 THEN 'Excellent'
+               WHEN PERCENT_RANK() OVER w_score >= 0.50 THEN 'Good'
+               WHEN PERCENT_RANK() OVER w_score >= 0.25 THEN 'Average'
+               ELSE 'Needs Improvement'
+           END                                          AS performance_tier
+    FROM   leaderboard_snapshot
+    WINDOW w_exam  AS (PARTITION BY exam_id),
+           w_score AS (PARTITION BY exam_id ORDER BY total_score DESC, total_time_sec ASC)
+) AS ranked ON lb.snapshot_id = ranked.snapshot_id
+SET lb.rank_position    = ranked.new_rank,
+    lb.standard_rank    = ranked.standard_rank,
+    lb.percentile_rank  = ranked.percentile_rank,
+    lb.quartile         = ranked.quartile,
+    lb.decile           = ranked.decile,
+    lb.running_avg      = ranked.running_avg,
+    lb.z_score          = ranked.z_score,
+    lb.coding_rank      = ranked.coding_rank,
+    lb.quiz_rank        = ranked.quiz_rank,
+    lb.assessment_rank  = ranked.assessment_rank,
+    lb.speed_rank       = ranked.speed_rank,
+    lb.performance_tier = ranked.performance_tier,
+    lb.last_calculated_at = NOW();
+
+
+-- ────────────────────────────────────────────────────────────────────────────
+-- 2. EXAM-WIDE AGGREGATES — one exam_stats row per exam with participants
+-- ────────────────────────────────────────────────────────────────────────────
+INSERT INTO exam_stats (
+    exam_id, participant_count, avg_score, stddev_score,
+    pass_rate_pct, distinction_rate_pct, last_calculated_at
+)
+SELECT * FROM (
+    SELECT exam_id,
+           COUNT(*)                                     AS participant_count,
+           ROUND(AVG(total_score), 4)                   AS avg_score,
+           ROUND(STDDEV_POP(total_score), 4)            AS stddev_score,
+           ROUND(
+               SUM(CASE WHEN total_score >= 40 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+           )                                            AS pass_rate_pct,
+           ROUND(
+               SUM(CASE WHEN total_score >= 75 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+           )                                            AS distinction_rate_pct,
+           NOW()                                        AS last_calculated_at
+    FROM   leaderboard_snapshot
+    GROUP  BY exam_id
+) AS s
+ON DUPLICATE KEY UPDATE
+    participant_count    = s.participant_count,
+    avg_score            = s.avg_score,
+    stddev_score         = s.stddev_score,
+    pass_rate_pct        = s.pass_rate_pct,
+    distinction_rate_pct = s.distinction_rate_pct,
+    last_calculated_at   = s.last_calculated_at;
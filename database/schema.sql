@@ -120,8 +120,10 @@ CREATE TABLE IF NOT EXISTS module_scores (
     created_at      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
 
-    CONSTRAINT fk_modscore_session FOREIGN KEY (session_id) REFERENCES exam_sessions(session_id),
+    CONSTRAINT fk_modscore_session FOREIGN KEY (session_id) REFERENCES exam_sessions(session_id)
+        ON DELETE CASCADE,
     UNIQUE KEY uq_session_module (session_id, module_type),
+    CONSTRAINT ck_modscore_raw_le_max CHECK (raw_score >= 0 AND raw_score <= max_score),
 
     INDEX idx_modscore_type (module_type)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -151,6 +153,20 @@ CREATE TABLE IF NOT EXISTS leaderboard_snapshot (
     -- Computed rank within this exam
     rank_position       INT UNSIGNED  NOT NULL DEFAULT 0,
 
+    -- Derived analytics, materialised alongside rank_position so the
+    -- analytics endpoints read plain columns instead of window functions
+    standard_rank       INT UNSIGNED  NOT NULL DEFAULT 0,
+    percentile_rank     DECIMAL(5,2)  NOT NULL DEFAULT 0.00,
+    quartile            TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    decile              TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    running_avg         DECIMAL(10,4) NOT NULL DEFAULT 0.0000,
+    z_score             DECIMAL(10,4) NOT NULL DEFAULT 0.0000,
+    coding_rank         INT UNSIGNED  NOT NULL DEFAULT 0,
+    quiz_rank           INT UNSIGNED  NOT NULL DEFAULT 0,
+    assessment_rank     INT UNSIGNED  NOT NULL DEFAULT 0,
+    speed_rank          INT UNSIGNED  NOT NULL DEFAULT 0,
+    performance_tier    VARCHAR(32)   NOT NULL DEFAULT 'Needs Improvement',
+
     last_calculated_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
 
     CONSTRAINT fk_lb_exam    FOREIGN KEY (exam_id)    REFERENCES exams(exam_id),
@@ -158,8 +174,11 @@ CREATE TABLE IF NOT EXISTS leaderboard_snapshot (
     CONSTRAINT fk_lb_session FOREIGN KEY (session_id) REFERENCES exam_sessions(session_id),
     UNIQUE KEY uq_lb_exam_user (exam_id, user_id),
 
-    -- The money index: fast sorted retrieval for the GET /leaderboard query
-    INDEX idx_lb_rank (exam_id, total_score DESC, total_time_sec ASC)
+    -- The money index: fast sorted retrieval for the GET /leaderboard query.
+    -- user_id makes the keyset seek an index range; the weighted_* columns
+    -- let a page be served from the index without touching the clustered row.
+    INDEX idx_lb_exam_score_time (exam_id, total_score DESC, total_time_sec ASC, user_id,
+                                  weighted_coding, weighted_quiz, weighted_assessment)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 
@@ -182,3 +201,19 @@ CREATE TABLE IF NOT EXISTS score_audit_log (
     INDEX idx_audit_session (session_id),
     INDEX idx_audit_ts      (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ────────────────────────────────────────────────────────────────────────────
+-- 7. EXAM STATS — exam-wide aggregates, refreshed together with the ranks
+-- ────────────────────────────────────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id              BIGINT UNSIGNED PRIMARY KEY,
+    participant_count    INT UNSIGNED  NOT NULL DEFAULT 0,
+    avg_score            DECIMAL(10,4) NOT NULL DEFAULT 0.0000,
+    stddev_score         DECIMAL(10,4) NOT NULL DEFAULT 0.0000,
+    pass_rate_pct        DECIMAL(5,2)  NOT NULL DEFAULT 0.00,
+    distinction_rate_pct DECIMAL(5,2)  NOT NULL DEFAULT 0.00,
+    last_calculated_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_stats_exam FOREIGN KEY (exam_id) REFERENCES exams(exam_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
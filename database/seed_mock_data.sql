@@ -178,20 +178,85 @@ DROP PROCEDURE IF EXISTS seed_candidates;
 
 -- ────────────────────────────────────────────────────────────────────────────
 -- 4. COMPUTE RANKS USING DENSE_RANK WITH TIE-BREAKER
+--    (mirrors _refresh_ranks() in app/services/scoring_engine.py, which also
+--     materialises the analytics columns and the exam_stats row)
 -- ────────────────────────────────────────────────────────────────────────────
 UPDATE leaderboard_snapshot AS lb
 INNER JOIN (
     SELECT snapshot_id,
-           DENSE_RANK() OVER (
-               ORDER BY total_score DESC,
-                        total_time_sec ASC
-           ) AS new_rank
+           DENSE_RANK() OVER w_score                    AS new_rank,
+           RANK() OVER w_score                          AS standard_rank,
+           ROUND(PERCENT_RANK() OVER w_score * 100, 2) AS percentile_rank,
+           NTILE(4) OVER w_score                        AS quartile,
+           NTILE(10) OVER w_score                       AS decile,
+           ROUND(AVG(total_score) OVER (
+               ORDER BY total_score DESC
+               ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+           ), 4)                                        AS running_avg,
+           ROUND(
+               CASE WHEN STDDEV_POP(total_score) OVER () > 0
+                    THEN (total_score - AVG(total_score) OVER ())
+                         / STDDEV_POP(total_score) OVER ()
+                    ELSE 0
+               END, 4
+           )                                            AS z_score,
+           DENSE_RANK() OVER (ORDER BY weighted_coding DESC)     AS coding_rank,
+           DENSE_RANK() OVER (ORDER BY weighted_quiz DESC)       AS quiz_rank,
+           DENSE_RANK() OVER (ORDER BY weighted_assessment DESC) AS assessment_rank,
+           DENSE_RANK() OVER (ORDER BY total_time_sec ASC)       AS speed_rank,
+           CASE
+               WHEN PERCENT_RANK() OVER w_score >= 0.90 THEN 'Outstanding'
+               WHEN PERCENT_RANK() OVER w_score >= 0.75 THEN 'Excellent'
+               WHEN PERCENT_RANK() OVER w_score >= 0.50 THEN 'Good'
+               WHEN PERCENT_RANK() OVER w_score >= 0.25 THEN 'Average'
+               ELSE 'Needs Improvement'
+           END                                          AS performance_tier
     FROM   leaderboard_snapshot
     WHERE  exam_id = @exam_id
+    WINDOW w_score AS (ORDER BY total_score DESC, total_time_sec ASC)
 ) AS ranked ON lb.snapshot_id = ranked.snapshot_id
-SET lb.rank_position = ranked.new_rank
+SET lb.rank_position    = ranked.new_rank,
+    lb.standard_rank    = ranked.standard_rank,
+    lb.percentile_rank  = ranked.percentile_rank,
+    lb.quartile         = ranked.quartile,
+    lb.decile           = ranked.decile,
+    lb.running_avg      = ranked.running_avg,
+    lb.z_score          = ranked.z_score,
+    lb.coding_rank      = ranked.coding_rank,
+    lb.quiz_rank        = ranked.quiz_rank,
+    lb.assessment_rank  = ranked.assessment_rank,
+    lb.speed_rank       = ranked.speed_rank,
+    lb.performance_tier = ranked.performance_tier,
+    lb.last_calculated_at = NOW()
 WHERE lb.exam_id = @exam_id;
 
+INSERT INTO exam_stats (
+    exam_id, participant_count, avg_score, stddev_score,
+    pass_rate_pct, distinction_rate_pct, last_calculated_at
+)
+SELECT * FROM (
+    SELECT @exam_id                                     AS exam_id,
+           COUNT(*)                                     AS participant_count,
+           COALESCE(ROUND(AVG(total_score), 4), 0)      AS avg_score,
+           COALESCE(ROUND(STDDEV_POP(total_score), 4), 0) AS stddev_score,
+           COALESCE(ROUND(
+               SUM(CASE WHEN total_score >= 40 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+           ), 0)                                        AS pass_rate_pct,
+           COALESCE(ROUND(
+               SUM(CASE WHEN total_score >= 75 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2
+           ), 0)                                        AS distinction_rate_pct,
+           NOW()                                        AS last_calculated_at
+    FROM   leaderboard_snapshot
+    WHERE  exam_id = @exam_id
+) AS s
+ON DUPLICATE KEY UPDATE
+    participant_count    = s.participant_count,
+    avg_score            = s.avg_score,
+    stddev_score         = s.stddev_score,
+    pass_rate_pct        = s.pass_rate_pct,
+    distinction_rate_pct = s.distinction_rate_pct,
+    last_calculated_at   = s.last_calculated_at;
+
 
 -- ════════════════════════════════════════════════════════════════════════════
 -- 5. ANALYTICAL WINDOW QUERIES — Detailed Statistics
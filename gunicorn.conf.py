@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration — gevent workers for the I/O-bound API.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every endpoint spends its time waiting on MySQL or Redis, so each worker
+runs a gevent loop: the worker monkey-patches the stdlib before loading
+the app, and PyMySQL / redis-py (pure-Python sockets) yield on I/O.  One
+process then serves up to `worker_connections` requests concurrently,
+bounded for DB work by the engine pool (pool_size + max_overflow per
+worker — keep workers × that total under MySQL's max_connections).
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gevent"
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,50 @@
+"""
+Shared fixtures — the testing config caches in Redis; point it at fakeredis.
+
+Tests marked `mysql` run MySQL-only SQL (INSERT … ON DUPLICATE KEY UPDATE,
+UPDATE … JOIN, STDDEV_POP) and are skipped when TestingConfig points at
+another database.
+"""
+
+from __future__ import annotations
+
+import fakeredis
+import pytest
+from sqlalchemy.engine import make_url
+
+from app.config import TestingConfig
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "mysql: needs MySQL-only SQL; skipped on other test databases",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if make_url(TestingConfig.SQLALCHEMY_DATABASE_URI).get_backend_name() == "mysql":
+        return
+    skip = pytest.mark.skip(reason="needs MySQL; the testing database is not MySQL")
+    for item in items:
+        if item.get_closest_marker("mysql"):
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fake_redis_server():
+    """Every RedisCache built during the run talks to one in-process server.
+
+    Session-scoped so it is in place before any plugin fixture builds an app.
+    """
+    server = fakeredis.FakeServer()
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr("redis.from_url", lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(_fake_redis_server):
+    """A client on the shared server, emptied before each test."""
+    client = fakeredis.FakeRedis(server=_fake_redis_server)
+    client.flushall()
+    return client
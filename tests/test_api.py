@@ -5,12 +5,15 @@ API Integration Tests — Leaderboard, Scores, Sessions endpoints.
 from __future__ import annotations
 
 import json
+import time
 
 import pytest
 
 from app import create_app
+from app.api.pagination import Cursor, decode_cursor, encode_cursor
 from app.extensions import db
-from app.models import User, Exam, ExamSession
+from app.models import User, Exam, ExamSession, LeaderboardSnapshot
+from app.services import leaderboard_store
 
 
 @pytest.fixture()
@@ -67,8 +70,43 @@ def seeded_client(client):
     }
 
 
+# (total_score, total_time_sec) per candidate, in user_id order: three-way
+# and two-way ties on both keys, so only user_id orders some rows.
+_TIED_RESULTS = [(90, 100), (80, 10), (90, 100), (90, 50), (80, 10), (90, 100), (70, 0)]
+
+
+@pytest.fixture()
+def ranked_client(seeded_client):
+    """seeded_client plus leaderboard rows for _TIED_RESULTS, written directly."""
+    c = seeded_client
+    expected = []
+    for i, (score, time_sec) in enumerate(_TIED_RESULTS):
+        user = User(
+            username=f"ranked{i}", email=f"ranked{i}@test.com",
+            full_name=f"Ranked {i}", password_hash="x",
+        )
+        db.session.add(user)
+        db.session.flush()
+        session = ExamSession(exam_id=c["exam_id"], user_id=user.user_id, status="submitted")
+        db.session.add(session)
+        db.session.flush()
+        db.session.add(LeaderboardSnapshot(
+            exam_id=c["exam_id"], user_id=user.user_id, session_id=session.session_id,
+            total_score=score, total_time_sec=time_sec,
+        ))
+        expected.append((-score, time_sec, user.user_id))
+    db.session.commit()
+
+    return {
+        **c,
+        "ranked_user_ids": [user_id for _, _, user_id in sorted(expected)],
+        "results": {user_id: (-neg_score, time_sec) for neg_score, time_sec, user_id in expected},
+    }
+
+
 class TestScoresAPI:
 
+    @pytest.mark.mysql
     def test_submit_score_success(self, seeded_client):
         c = seeded_client
         resp = c["client"].post("/api/v1/scores", json={
@@ -105,6 +143,125 @@ class TestScoresAPI:
         })
         assert resp.status_code == 422
 
+    @pytest.mark.parametrize("field, value", [
+        ("raw_score", 100.01),
+        ("raw_score", -1),
+        ("time_spent_sec", -1),
+    ], ids=["above-max", "negative-score", "negative-time"])
+    def test_out_of_range_values_rejected(self, seeded_client, field, value):
+        c = seeded_client
+        body = {
+            "session_id": c["session_id"],
+            "module_type": "quiz",
+            "raw_score": 50,
+            "max_score": 100,
+            "time_spent_sec": 500,
+            field: value,
+        }
+        resp = c["client"].post("/api/v1/scores", json=body)
+
+        assert resp.status_code == 422
+        assert field in resp.get_json()["errors"]
+
+
+class TestScoreIdempotency:
+
+    @pytest.fixture()
+    def applied(self, seeded_client, monkeypatch):
+        """Record each submission that reaches the transaction."""
+        from app.services import scoring_engine
+
+        calls = []
+
+        def fake_update(**kwargs):
+            calls.append(kwargs)
+            return {"exam_id": seeded_client["exam_id"], "rank": 1, "attempt": len(calls)}
+
+        monkeypatch.setattr(scoring_engine, "_atomic_score_update", fake_update)
+        return calls
+
+    @staticmethod
+    def _submit(c, key, module_type="coding", raw_score=85):
+        return c["client"].post("/api/v1/scores", headers={"Idempotency-Key": key}, json={
+            "session_id": c["session_id"],
+            "module_type": module_type,
+            "raw_score": raw_score,
+            "max_score": 100,
+            "time_spent_sec": 2400,
+            "details": {"b": 2, "a": 1},
+        })
+
+    def test_replay_returns_first_response(self, seeded_client, applied):
+        first = self._submit(seeded_client, "retry-1")
+        second = self._submit(seeded_client, "retry-1")
+
+        assert first.status_code == second.status_code == 200
+        assert second.get_json() == first.get_json()
+        assert len(applied) == 1
+
+    def test_key_is_scoped_to_the_module(self, seeded_client, applied):
+        self._submit(seeded_client, "retry-1", module_type="coding")
+        resp = self._submit(seeded_client, "retry-1", module_type="quiz")
+
+        assert resp.status_code == 200
+        assert resp.get_json()["leaderboard_entry"]["attempt"] == 2
+        assert len(applied) == 2
+
+    def test_payload_mismatch_rejected(self, seeded_client, applied):
+        self._submit(seeded_client, "retry-1", raw_score=85)
+        resp = self._submit(seeded_client, "retry-1", raw_score=90)
+
+        assert resp.status_code == 422
+        assert len(applied) == 1
+
+    def test_retry_while_first_in_flight_is_rejected(self, seeded_client, monkeypatch):
+        from app.services import scoring_engine
+
+        c = seeded_client
+        racing = []
+
+        def slow_update(**kwargs):
+            # The client's retry lands before this transaction has finished
+            racing.append(self._submit(c, "retry-1"))
+            return {"exam_id": c["exam_id"], "rank": 1}
+
+        monkeypatch.setattr(scoring_engine, "_atomic_score_update", slow_update)
+        first = self._submit(c, "retry-1")
+
+        assert first.status_code == 200
+        assert [r.status_code for r in racing] == [409]
+        # Once the first has finished, the same retry replays its response
+        assert self._submit(c, "retry-1").get_json() == first.get_json()
+
+    def test_failed_submission_releases_key(self, seeded_client, monkeypatch):
+        from app.services import scoring_engine
+
+        c = seeded_client
+        calls = []
+
+        def flaky_update(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise ValueError("Unknown session")
+            return {"exam_id": c["exam_id"], "rank": 1}
+
+        monkeypatch.setattr(scoring_engine, "_atomic_score_update", flaky_update)
+
+        assert self._submit(c, "retry-1").status_code == 400
+        assert self._submit(c, "retry-1").status_code == 200
+        assert len(calls) == 2
+
+    def test_without_key_every_post_applies(self, seeded_client, applied):
+        c = seeded_client
+        body = {
+            "session_id": c["session_id"], "module_type": "coding",
+            "raw_score": 85, "max_score": 100, "time_spent_sec": 2400,
+        }
+        c["client"].post("/api/v1/scores", json=body)
+        c["client"].post("/api/v1/scores", json=body)
+
+        assert len(applied) == 2
+
 
 class TestLeaderboardAPI:
 
@@ -115,6 +272,7 @@ class TestLeaderboardAPI:
         data = resp.get_json()
         assert data["total_participants"] == 0
 
+    @pytest.mark.mysql
     def test_leaderboard_after_score(self, seeded_client):
         c = seeded_client
         # Submit a score first
@@ -138,6 +296,328 @@ class TestLeaderboardAPI:
         assert resp.status_code == 400
 
 
+class TestLeaderboardCaching:
+
+    @pytest.fixture()
+    def window_loads(self, monkeypatch):
+        """Count the windows actually read from the store / MySQL."""
+        from app.api import leaderboard
+
+        calls = []
+        load = leaderboard._load_window
+
+        def counting_load(*args):
+            calls.append(args)
+            return load(*args)
+
+        monkeypatch.setattr(leaderboard, "_load_window", counting_load)
+        return calls
+
+    def test_window_built_once_then_served_from_cache(self, client):
+        from app.api.leaderboard import _get_or_build_window
+
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {"entries": [1, 2]}
+
+        assert _get_or_build_window("w:test", build) == ({"entries": [1, 2]}, False)
+        assert _get_or_build_window("w:test", build) == ({"entries": [1, 2]}, True)
+        assert builds == [1]
+
+    def test_missing_exam_is_not_cached(self, client):
+        from app.api.leaderboard import _get_or_build_window
+        from app.extensions import cache
+
+        assert _get_or_build_window("w:none", lambda: None) == (None, False)
+        assert cache.get("w:none") is None
+        assert cache.get("w:none:lock") is None
+
+    def test_waiter_takes_window_built_by_lock_holder(self, client, monkeypatch):
+        from app.api import leaderboard
+        from app.extensions import cache
+
+        cache.add("w:busy:lock", 1)
+        # The lock holder finishes while we poll
+        monkeypatch.setattr(
+            leaderboard.time, "sleep",
+            lambda _: cache.set("w:busy", leaderboard.json_provider.dumps({"entries": [7]})),
+        )
+
+        window = leaderboard._get_or_build_window("w:busy", lambda: pytest.fail("rebuilt"))
+        assert window == ({"entries": [7]}, True)
+
+    def test_waiter_builds_itself_after_lock_timeout(self, client, monkeypatch):
+        from app.api import leaderboard
+        from app.extensions import cache
+
+        monkeypatch.setattr(leaderboard, "_LOCK_TIMEOUT_SEC", 0.1)
+        cache.add("w:stuck:lock", 1, timeout=60)  # holder died without releasing
+
+        started = time.monotonic()
+        window = leaderboard._get_or_build_window("w:stuck", lambda: {"entries": [3]})
+
+        assert window == ({"entries": [3]}, False)
+        assert 0.1 <= time.monotonic() - started < 1
+        assert leaderboard.json_provider.loads(cache.get("w:stuck")) == {"entries": [3]}
+
+    def test_page_sizes_in_one_bucket_share_a_window(self, ranked_client, window_loads):
+        c = ranked_client
+        base = f"/api/v1/leaderboard?exam_id={c['exam_id']}"
+
+        small = c["client"].get(f"{base}&per_page=3").get_json()
+        large = c["client"].get(f"{base}&per_page=20").get_json()
+
+        assert len(window_loads) == 1  # both fit the 25-row bucket
+        assert [e["user_id"] for e in small["leaderboard"]] == c["ranked_user_ids"][:3]
+        assert [e["user_id"] for e in large["leaderboard"]] == c["ranked_user_ids"]
+        assert small["next_cursor"] is not None and large["next_cursor"] is None
+
+        c["client"].get(f"{base}&per_page=30")
+        assert len(window_loads) == 2  # next bucket up
+
+    @pytest.mark.parametrize("warm", [False, True], ids=["uncached", "cached"])
+    def test_cached_flag_and_my_entry_spliced_into_body(self, ranked_client, warm):
+        c = ranked_client
+        url = f"/api/v1/leaderboard?exam_id={c['exam_id']}&per_page=2"
+        user_id = c["ranked_user_ids"][4]
+        if warm:
+            c["client"].get(url)
+
+        resp = c["client"].get(f"{url}&user_id={user_id}")
+        data = json.loads(resp.get_data())  # the spliced bytes must be valid JSON
+
+        assert data["cached"] is warm
+        assert resp.headers["X-Cache"] == ("HIT" if warm else "MISS")
+        assert [e["user_id"] for e in data["leaderboard"]] == c["ranked_user_ids"][:2]
+        assert data["my_entry"]["user_id"] == user_id
+        assert data["my_entry"]["total_score"] == c["results"][user_id][0]
+
+    def test_my_entry_null_for_non_participant(self, ranked_client):
+        c = ranked_client
+        url = f"/api/v1/leaderboard?exam_id={c['exam_id']}"
+
+        for _ in range(2):  # uncached, then cached
+            data = json.loads(c["client"].get(f"{url}&user_id={c['user_id']}").get_data())
+            assert data["my_entry"] is None
+
+    def test_stored_body_excludes_per_request_fields(self, ranked_client):
+        from app.extensions import cache
+
+        c = ranked_client
+        c["client"].get(f"/api/v1/leaderboard?exam_id={c['exam_id']}&user_id={c['user_id']}")
+
+        body = cache.get(f"leaderboard:exam:{c['exam_id']}:v0:s0:pp50:p1")
+        assert body is not None
+        assert set(json.loads(body)) == {
+            "exam_id", "exam_title", "total_participants", "page", "per_page",
+            "leaderboard", "next_cursor",
+        }
+
+
+class TestHTTPCaching:
+
+    @staticmethod
+    def _conditional(app, headers=None, method="GET", **kwargs):
+        from flask import Response
+        from app.api.http_cache import conditional
+
+        with app.test_request_context("/", method=method, headers=headers or {}):
+            return conditional(Response(b'{"a":1}', mimetype="application/json"), **kwargs)
+
+    def test_etag_and_cache_control_added(self, client):
+        resp = self._conditional(client.application)
+
+        etag, weak = resp.get_etag()
+        assert resp.status_code == 200
+        assert etag and not weak
+        assert resp.headers["Cache-Control"] == "public, max-age=5"
+
+    def test_private_cache_control(self, client):
+        resp = self._conditional(client.application, private=True)
+        assert resp.headers["Cache-Control"] == "private, max-age=5"
+
+    def test_matching_if_none_match_is_304(self, client):
+        etag, _ = self._conditional(client.application).get_etag()
+
+        resp = self._conditional(client.application, {"If-None-Match": f'"{etag}"'})
+
+        assert resp.status_code == 304
+        assert resp.get_data() == b""
+        assert resp.get_etag() == (etag, False)
+        assert resp.headers["Cache-Control"] == "public, max-age=5"
+
+    @pytest.mark.parametrize("suffix", [":br", ":gzip"])
+    def test_compression_suffix_is_ignored(self, client, suffix):
+        etag, _ = self._conditional(client.application).get_etag()
+
+        resp = self._conditional(client.application, {"If-None-Match": f'"other", "{etag}{suffix}"'})
+
+        assert resp.status_code == 304
+        # The client's own validator is echoed back, suffix included
+        assert resp.get_etag() == (etag + suffix, False)
+
+    def test_stale_if_none_match_gets_body(self, client):
+        resp = self._conditional(client.application, {"If-None-Match": '"stale"'})
+        assert resp.status_code == 200
+        assert resp.get_data() == b'{"a":1}'
+
+    def test_non_get_untouched(self, client):
+        resp = self._conditional(client.application, method="POST")
+        assert "ETag" not in resp.headers and "Cache-Control" not in resp.headers
+
+    def test_leaderboard_etag_ignores_cached_flag(self, ranked_client):
+        c = ranked_client
+        url = f"/api/v1/leaderboard?exam_id={c['exam_id']}"
+
+        miss = c["client"].get(url)
+        hit = c["client"].get(url)
+
+        assert (miss.headers["X-Cache"], hit.headers["X-Cache"]) == ("MISS", "HIT")
+        assert miss.get_json()["cached"] is False and hit.get_json()["cached"] is True
+        assert miss.get_etag() == hit.get_etag()
+        assert hit.get_etag()[1]  # weak: the bodies differ in `cached`
+
+        etag, _ = hit.get_etag()
+        resp = c["client"].get(url, headers={"If-None-Match": f'W/"{etag}"'})
+        assert resp.status_code == 304
+        assert resp.get_data() == b""
+
+    def test_leaderboard_etag_covers_my_entry(self, ranked_client):
+        c = ranked_client
+        url = f"/api/v1/leaderboard?exam_id={c['exam_id']}"
+        first, last = c["ranked_user_ids"][0], c["ranked_user_ids"][-1]
+
+        anonymous = c["client"].get(url)
+        mine = c["client"].get(f"{url}&user_id={first}")
+        theirs = c["client"].get(f"{url}&user_id={last}")
+
+        assert len({anonymous.get_etag(), mine.get_etag(), theirs.get_etag()}) == 3
+        assert anonymous.headers["Cache-Control"].startswith("public")
+        assert mine.headers["Cache-Control"].startswith("private")
+
+        etag, _ = mine.get_etag()
+        resp = c["client"].get(f"{url}&user_id={last}", headers={"If-None-Match": f'W/"{etag}"'})
+        assert resp.status_code == 200
+
+    def test_compressed_leaderboard_revalidates(self, ranked_client):
+        c = ranked_client
+        url = f"/api/v1/leaderboard?exam_id={c['exam_id']}&per_page=200"
+
+        resp = c["client"].get(url, headers={"Accept-Encoding": "gzip"})
+        assert resp.headers.get("Content-Encoding") == "gzip"
+
+        etag, _ = resp.get_etag()
+        resp = c["client"].get(
+            url, headers={"Accept-Encoding": "gzip", "If-None-Match": f'W/"{etag}"'},
+        )
+        assert resp.status_code == 304
+
+
+class TestLeaderboardPagination:
+
+    def test_cursor_round_trip(self):
+        token = encode_cursor(87.5, 1200, 42, 10)
+
+        assert decode_cursor(token) == Cursor(87.5, 1200, 42, 10)
+        # URL-safe and unpadded, so it needs no escaping in a query string
+        assert "=" not in token and "+" not in token and "/" not in token
+
+    @pytest.mark.parametrize("token", ["not-a-cursor", "", "W10", "WzEsMiwzXQ", "WyJhIiwyLDMsNF0"])
+    def test_decode_rejects_malformed_tokens(self, token):
+        # garbage, empty, [], [1,2,3], ["a",2,3,4]
+        with pytest.raises(ValueError):
+            decode_cursor(token)
+
+    def test_malformed_cursor_is_400(self, seeded_client):
+        c = seeded_client
+        resp = c["client"].get(f"/api/v1/leaderboard?exam_id={c['exam_id']}&after=WzEsMiwzXQ")
+        assert resp.status_code == 400
+        assert resp.get_json() == {"error": "Invalid cursor"}
+
+    @pytest.mark.parametrize("from_store", [False, True], ids=["mysql", "redis"])
+    def test_cursor_pages_cover_ties_exactly_once(self, ranked_client, from_store, monkeypatch):
+        c = ranked_client
+        if from_store:
+            leaderboard_store.rebuild(c["exam_id"])
+            monkeypatch.setattr("app.api.leaderboard._read_page_from_db", None)
+
+        seen, row_nums, after = [], [], None
+        while True:
+            url = f"/api/v1/leaderboard?exam_id={c['exam_id']}&per_page=2"
+            resp = c["client"].get(url + (f"&after={after}" if after else ""))
+            assert resp.status_code == 200
+            data = resp.get_json()
+            seen += [e["user_id"] for e in data["leaderboard"]]
+            after = data["next_cursor"]
+            if after is None:
+                break
+            row_nums.append(decode_cursor(after).position)
+
+        assert seen == c["ranked_user_ids"]
+        assert row_nums == [2, 4, 6]
+
+    def test_cursor_pages_match_offset_pages(self, ranked_client):
+        c = ranked_client
+        base = f"/api/v1/leaderboard?exam_id={c['exam_id']}&per_page=3"
+
+        by_offset = []
+        for page in (1, 2, 3):
+            data = c["client"].get(f"{base}&page={page}").get_json()
+            by_offset += [e["user_id"] for e in data["leaderboard"]]
+
+        first = c["client"].get(base).get_json()
+        second = c["client"].get(f"{base}&after={first['next_cursor']}").get_json()
+
+        assert by_offset == c["ranked_user_ids"]
+        assert [e["user_id"] for e in first["leaderboard"] + second["leaderboard"]] == by_offset[:6]
+
+
+class TestAnalyticsModules:
+
+    def test_unknown_exam_is_404(self, seeded_client):
+        resp = seeded_client["client"].get("/api/v1/analytics/modules?exam_id=99999")
+        assert resp.status_code == 404
+        assert resp.get_json() == {"error": "Exam not found"}
+
+    def test_cached_body_served_without_query(self, seeded_client, monkeypatch):
+        from app.api import analytics
+        from app.extensions import cache
+
+        c = seeded_client
+        with c["client"].application.test_request_context(
+            f"/api/v1/analytics/modules?exam_id={c['exam_id']}",
+        ):
+            cache_key = analytics._versioned_cache_key()
+        cache.set(cache_key, b'{"cached":true}')
+        monkeypatch.setattr(analytics, "_EXAM_EXISTS_SQL", None)  # must not be reached
+
+        resp = c["client"].get(f"/api/v1/analytics/modules?exam_id={c['exam_id']}")
+        assert resp.status_code == 200
+        assert resp.get_json() == {"cached": True}
+
+    def test_stream_cached_once_complete(self, client):
+        from app.api.analytics import _caching_stream
+        from app.extensions import cache
+
+        assert b"".join(_caching_stream(iter([b"[1,", b"2]"]), "s:test")) == b"[1,2]"
+        assert cache.get("s:test") == b"[1,2]"
+
+    def test_oversized_or_abandoned_stream_not_cached(self, client, monkeypatch):
+        from app.api import analytics
+        from app.extensions import cache
+
+        monkeypatch.setattr(analytics, "_STREAM_CACHE_MAX_BYTES", 3)
+        assert b"".join(analytics._caching_stream(iter([b"[1,", b"2]"]), "s:big")) == b"[1,2]"
+        assert cache.get("s:big") is None
+
+        stream = analytics._caching_stream(iter([b"[", b"]"]), "s:cut")
+        next(stream)
+        stream.close()
+        assert cache.get("s:cut") is None
+
+
 class TestSessionsAPI:
 
     def test_create_session(self, seeded_client):
@@ -165,6 +645,64 @@ class TestSessionsAPI:
             "user_id": c["user_id"],
         })
         assert resp.status_code == 409
+        assert resp.get_json()["session_id"] == c["session_id"]
+        assert ExamSession.query.filter_by(user_id=c["user_id"]).count() == 1
+
+    def test_session_can_be_created_after_duplicate(self, seeded_client):
+        """The rolled-back duplicate INSERT leaves the DB session usable."""
+        c = seeded_client
+        c["client"].post("/api/v1/sessions", json={
+            "exam_id": c["exam_id"], "user_id": c["user_id"],
+        })
+
+        other = User(
+            username="candidate3", email="c3@test.com",
+            full_name="Candidate Three", password_hash="x",
+        )
+        db.session.add(other)
+        db.session.commit()
+
+        resp = c["client"].post("/api/v1/sessions", json={
+            "exam_id": c["exam_id"], "user_id": other.user_id,
+        })
+        assert resp.status_code == 201
+
+    @pytest.mark.parametrize("body, field", [
+        ({"user_id": 1}, "exam_id"),
+        ({"exam_id": 1}, "user_id"),
+        ({}, "exam_id"),
+        ({"exam_id": "1", "user_id": 1}, "exam_id"),
+        ({"exam_id": 1, "user_id": 1.5}, "user_id"),
+        ({"exam_id": True, "user_id": 1}, "exam_id"),
+        ({"exam_id": None, "user_id": 1}, "exam_id"),
+        ({"exam_id": 1, "user_id": 1, "extra": 1}, "extra"),
+        ([1, 1], "_schema"),
+    ], ids=[
+        "missing-exam", "missing-user", "empty", "string-id", "float-id",
+        "bool-id", "null-id", "unknown-field", "not-an-object",
+    ])
+    def test_invalid_body_rejected(self, seeded_client, body, field):
+        resp = seeded_client["client"].post("/api/v1/sessions", json=body)
+
+        assert resp.status_code == 422
+        assert field in resp.get_json()["errors"]
+
+    def test_unplanned_collection_load_raises(self, seeded_client, monkeypatch):
+        from flask import current_app
+        from sqlalchemy.exc import InvalidRequestError
+
+        c = seeded_client
+        db.session.expunge_all()
+        session = db.session.get(ExamSession, c["session_id"])
+        with pytest.raises(InvalidRequestError):
+            session.module_scores
+
+        # Read from the app config at load time, not fixed at import
+        monkeypatch.setitem(current_app.config, "RAISE_ON_LAZY_COLLECTIONS", False)
+        assert session.module_scores == []
+
+        resp = c["client"].get(f"/api/v1/sessions/{c['session_id']}")
+        assert resp.status_code == 200
 
     def test_finish_session(self, seeded_client):
         c = seeded_client
@@ -0,0 +1,176 @@
+"""
+Audit Log Tests — Redis-queued rows, the inline fallback, and the drain job.
+"""
+
+from __future__ import annotations
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.extensions import db
+from app.models import User, Exam, ExamSession, ScoreAuditLog
+from app.services import audit_log
+
+
+@pytest.fixture()
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture()
+def session_id(app):
+    admin = User(
+        username="admin", email="admin@test.com",
+        full_name="Admin", password_hash="x", role="admin",
+    )
+    db.session.add(admin)
+    db.session.flush()
+
+    exam = Exam(title="Audit Exam", status="active", created_by=admin.user_id)
+    db.session.add(exam)
+    db.session.flush()
+
+    session = ExamSession(exam_id=exam.exam_id, user_id=admin.user_id, status="in_progress")
+    db.session.add(session)
+    db.session.commit()
+    return session.session_id
+
+
+@pytest.fixture()
+def no_drain(monkeypatch):
+    """Leave queued rows in Redis instead of draining them eagerly."""
+    monkeypatch.setattr(audit_log.flush_audit_log, "delay", lambda: None)
+
+
+def _logged_scores() -> list[float]:
+    rows = db.session.scalars(select(ScoreAuditLog).order_by(ScoreAuditLog.log_id))
+    return [float(r.new_score) for r in rows]
+
+
+def _queue(session_id: int, *scores: float) -> None:
+    for score in scores:
+        audit_log.record(session_id, "coding", None, score, changed_by=1)
+
+
+class TestRecord:
+
+    def test_row_is_queued_in_redis(self, session_id, no_drain, fake_redis):
+        audit_log.record(session_id, "quiz", 40.0, 55.5, changed_by=7)
+
+        assert fake_redis.llen(audit_log._QUEUE_KEY) == 1
+        assert _logged_scores() == []
+
+        row = audit_log._decode(fake_redis.lindex(audit_log._QUEUE_KEY, 0))
+        assert row["session_id"] == session_id
+        assert row["module_type"] == "quiz"
+        assert row["old_score"] == 40.0
+        assert row["new_score"] == 55.5
+        assert row["changed_by"] == 7
+        assert row["created_at"].tzinfo is not None
+
+    def test_queued_row_is_drained(self, session_id, fake_redis):
+        # Celery runs eagerly under testing, so the drain happens inline
+        audit_log.record(session_id, "coding", None, 80.0, changed_by=1)
+
+        assert _logged_scores() == [80.0]
+        assert fake_redis.llen(audit_log._QUEUE_KEY) == 0
+
+    def test_one_drain_is_scheduled_per_debounce_window(self, session_id, monkeypatch):
+        calls = []
+        monkeypatch.setattr(audit_log.flush_audit_log, "delay", lambda: calls.append(1))
+
+        _queue(session_id, 1.0, 2.0, 3.0)
+
+        assert calls == [1]
+
+    def test_inline_fallback_without_redis(self, session_id, monkeypatch, fake_redis):
+        monkeypatch.setattr(audit_log, "_client", lambda: None)
+
+        audit_log.record(session_id, "assessment", 10.0, 20.0, changed_by=1)
+
+        assert _logged_scores() == [20.0]
+        assert fake_redis.llen(audit_log._QUEUE_KEY) == 0
+
+    def test_inline_fallback_when_push_fails(self, session_id, monkeypatch, fake_redis):
+        def refuse(*args):
+            raise RedisConnectionError("down")
+
+        monkeypatch.setattr(fake_redis.__class__, "rpush", refuse)
+
+        audit_log.record(session_id, "coding", None, 65.0, changed_by=1)
+
+        assert _logged_scores() == [65.0]
+
+
+class TestFlushAuditLog:
+
+    def test_flush_inserts_in_order(self, session_id, no_drain, fake_redis):
+        _queue(session_id, 1.0, 2.0, 3.0)
+
+        assert audit_log.flush_audit_log() == 3
+        assert _logged_scores() == [1.0, 2.0, 3.0]
+        assert fake_redis.llen(audit_log._QUEUE_KEY) == 0
+        assert fake_redis.llen(audit_log._PROCESSING_KEY) == 0
+
+    def test_flush_drains_in_batches(self, session_id, no_drain, monkeypatch):
+        monkeypatch.setattr(audit_log, "BATCH_SIZE", 2)
+        _queue(session_id, 1.0, 2.0, 3.0, 4.0, 5.0)
+
+        assert audit_log.flush_audit_log() == 5
+        assert _logged_scores() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    def test_failed_insert_keeps_the_batch(self, session_id, no_drain, monkeypatch, fake_redis):
+        _queue(session_id, 1.0, 2.0)
+
+        def fail():
+            raise OperationalError("INSERT", {}, Exception("gone away"))
+
+        with monkeypatch.context() as m:
+            m.setattr(db.session, "commit", fail)
+            with pytest.raises(OperationalError):
+                audit_log.flush_audit_log()
+
+        assert _logged_scores() == []
+        assert fake_redis.llen(audit_log._PROCESSING_KEY) == 2
+
+        # Rows queued since go in after the stranded batch
+        _queue(session_id, 3.0)
+        assert audit_log.flush_audit_log() == 3
+        assert _logged_scores() == [1.0, 2.0, 3.0]
+        assert fake_redis.llen(audit_log._PROCESSING_KEY) == 0
+
+    def test_any_failure_keeps_the_batch(self, session_id, no_drain, monkeypatch, fake_redis):
+        _queue(session_id, 1.0)
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("worker interrupted")
+
+        with monkeypatch.context() as m:
+            m.setattr(db.session, "execute", fail)
+            with pytest.raises(RuntimeError):
+                audit_log.flush_audit_log()
+
+        assert fake_redis.llen(audit_log._PROCESSING_KEY) == 1
+        assert audit_log.flush_audit_log() == 1
+        assert _logged_scores() == [1.0]
+
+    def test_concurrent_drain_steps_aside(self, session_id, no_drain, fake_redis):
+        from app.extensions import cache
+
+        _queue(session_id, 1.0)
+        cache.add(audit_log._LOCK_KEY, 1)
+
+        assert audit_log.flush_audit_log() == 0
+        assert fake_redis.llen(audit_log._QUEUE_KEY) == 1
+
+    def test_flush_with_nothing_queued(self, app):
+        assert audit_log.flush_audit_log() == 0
+        assert db.session.scalar(select(func.count()).select_from(ScoreAuditLog)) == 0
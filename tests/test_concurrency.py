@@ -21,7 +21,10 @@ import pytest
 from app import create_app
 from app.extensions import db
 from app.models import User, Exam, ExamSession, LeaderboardSnapshot
-from app.services.scoring_engine import submit_module_score, recalculate_all_ranks
+from app.services.scoring_engine import (
+    _leaderboard_cache_version,
+    submit_module_score, submit_module_scores_bulk, recalculate_all_ranks,
+)
 
 
 @pytest.fixture()
@@ -56,33 +59,40 @@ def seed_data(app):
         db.session.flush()
 
         num_candidates = 20
-        sessions = []
 
-        for i in range(num_candidates):
-            u = User(
+        # One flush per table: the ORM batches each into a multi-row INSERT
+        users = [
+            User(
                 username=f"user_{i}", email=f"user_{i}@test.com",
                 full_name=f"User {i}", password_hash="x",
             )
-            db.session.add(u)
-            db.session.flush()
-
-            s = ExamSession(exam_id=exam.exam_id, user_id=u.user_id, status="in_progress")
-            db.session.add(s)
-            db.session.flush()
-            sessions.append(s.session_id)
+            for i in range(num_candidates)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
 
-        db.session.commit()
+        sessions = [
+            ExamSession(exam_id=exam.exam_id, user_id=u.user_id, status="in_progress")
+            for u in users
+        ]
+        db.session.add_all(sessions)
+        db.session.flush()
 
-        return {
+        # Read the ids before commit expires the instances
+        result = {
             "exam_id": exam.exam_id,
-            "session_ids": sessions,
+            "session_ids": [s.session_id for s in sessions],
             "num_candidates": num_candidates,
         }
 
+        db.session.commit()
+        return result
+
 
 class TestConcurrentScoreSubmission:
     """Verify data integrity under parallel writes."""
 
+    @pytest.mark.mysql
     def test_parallel_module_submissions_no_data_loss(self, app, seed_data):
         """
         All N candidates submit coding scores at the same time.
@@ -132,6 +142,7 @@ class TestConcurrentScoreSubmission:
                 f"got {len(entries)}"
             )
 
+    @pytest.mark.mysql
     def test_tie_breaking_by_time(self, app, seed_data):
         """
         Two candidates with the same total_score should be ranked by
@@ -165,6 +176,7 @@ class TestConcurrentScoreSubmission:
                 f"A(rank={a_entry.rank_position}, time={a_entry.total_time_sec})"
             )
 
+    @pytest.mark.mysql
     def test_weighted_score_calculation(self, app, seed_data):
         """Verify the weighted formula: coding×50% + quiz×30% + assessment×20%."""
 
@@ -186,3 +198,88 @@ class TestConcurrentScoreSubmission:
             assert Decimal(str(entry.total_score)) == expected, (
                 f"Expected total_score={expected}, got {entry.total_score}"
             )
+
+    @pytest.mark.mysql
+    def test_exam_weight_change_applies_to_next_submission(self, app, seed_data):
+        """Committing new exam weights evicts the cached ones before the next submit."""
+
+        first, second = seed_data["session_ids"][:2]
+
+        with app.app_context():
+            # Caches the exam's 50/30/20 weights
+            assert submit_module_score(first, "coding", 80, 100, 1000)["total_score"] == 40.0
+
+            exam = db.session.get(Exam, seed_data["exam_id"])
+            exam.weight_coding, exam.weight_quiz = 60, 20
+            db.session.commit()
+
+            # 80/100 × 60
+            assert submit_module_score(second, "coding", 80, 100, 1000)["total_score"] == 48.0
+
+    @pytest.mark.mysql
+    def test_identical_resubmit_reranks_only_when_total_moves(self, app, seed_data):
+        """
+        Re-sending the same module score skips the exam re-rank, unless a
+        weight change since means it now yields a different total.
+        """
+
+        first, second = seed_data["session_ids"][:2]
+
+        def cache_version():
+            return _leaderboard_cache_version(seed_data["exam_id"])
+
+        def rank_of(session_id):
+            db.session.expire_all()
+            return LeaderboardSnapshot.query.filter_by(session_id=session_id).one().rank_position
+
+        with app.app_context():
+            submit_module_score(first, "coding", 80, 100, 1000)   # 80/100 × 50 = 40
+            submit_module_score(second, "quiz", 100, 100, 1000)   # 100/100 × 30 = 30
+            assert (rank_of(first), rank_of(second)) == (1, 2)
+
+            version = cache_version()
+            submit_module_score(first, "coding", 80, 100, 1000)
+            assert cache_version() == version
+
+            exam = db.session.get(Exam, seed_data["exam_id"])
+            exam.weight_coding, exam.weight_quiz = 20, 60
+            db.session.commit()
+
+            # Same inputs, new total: 80/100 × 20 = 16, now behind 30
+            assert submit_module_score(first, "coding", 80, 100, 1000)["total_score"] == 16.0
+            assert cache_version() != version
+            assert (rank_of(first), rank_of(second)) == (2, 1)
+
+    @pytest.mark.mysql
+    def test_bulk_submission_matches_single_path(self, app, seed_data):
+        """
+        submit_module_scores_bulk writes every candidate in one transaction
+        and yields the same totals and tie-break order as single submits.
+        """
+
+        sids = seed_data["session_ids"]
+        submissions = [
+            {"session_id": sid, "module_type": "coding", "raw_score": 80,
+             "max_score": 100, "time_spent_sec": 1000 + idx}
+            for idx, sid in enumerate(sids)
+        ] + [
+            {"session_id": sids[0], "module_type": "quiz", "raw_score": 90,
+             "max_score": 100, "time_spent_sec": 500},
+        ]
+
+        with app.app_context():
+            written = submit_module_scores_bulk(submissions)
+            assert written == len(submissions)
+
+            lb = {
+                e.session_id: e
+                for e in LeaderboardSnapshot.query.filter_by(exam_id=seed_data["exam_id"])
+            }
+            assert len(lb) == seed_data["num_candidates"]
+
+            # (80/100)*50 + (90/100)*30 = 40 + 27 = 67.0
+            assert Decimal(str(lb[sids[0]].total_score)) == Decimal("67.0000")
+            assert Decimal(str(lb[sids[1]].total_score)) == Decimal("40.0000")
+
+            # Equal scores: the faster candidate ranks higher
+            assert lb[sids[1]].rank_position < lb[sids[2]].rank_position
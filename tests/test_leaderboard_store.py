@@ -0,0 +1,211 @@
+"""
+Leaderboard Store Tests — the Redis sorted-set read model and its fallbacks.
+"""
+
+from __future__ import annotations
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import create_app, json_provider
+from app.extensions import db
+from app.models import User, Exam, ExamSession, LeaderboardSnapshot
+from app.services import leaderboard_store
+from app.services.leaderboard_store import _member, _sort_key
+
+
+@pytest.fixture()
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture()
+def exam(app):
+    """An exam with five ranked participants; returns (exam_id, user_ids in rank order)."""
+    admin = User(
+        username="admin", email="admin@test.com",
+        full_name="Admin", password_hash="x", role="admin",
+    )
+    db.session.add(admin)
+    db.session.flush()
+
+    exam = Exam(title="Store Exam", status="active", created_by=admin.user_id)
+    db.session.add(exam)
+    db.session.flush()
+
+    results = [(72.5, 300), (88.25, 900), (88.25, 600), (72.5, 300), (40.0, 10)]
+    keys = []
+    for i, (score, time_sec) in enumerate(results):
+        user = User(
+            username=f"u{i}", email=f"u{i}@test.com",
+            full_name=f"User {i}", password_hash="x",
+        )
+        db.session.add(user)
+        db.session.flush()
+        session = ExamSession(exam_id=exam.exam_id, user_id=user.user_id, status="submitted")
+        db.session.add(session)
+        db.session.flush()
+        db.session.add(LeaderboardSnapshot(
+            exam_id=exam.exam_id, user_id=user.user_id, session_id=session.session_id,
+            total_score=score, total_time_sec=time_sec,
+        ))
+        keys.append((-score, time_sec, user.user_id))
+    db.session.commit()
+
+    return exam.exam_id, [user_id for _, _, user_id in sorted(keys)]
+
+
+def _ids(entries: list[dict]) -> list[int]:
+    return [e["user_id"] for e in entries]
+
+
+class TestSortKey:
+
+    def test_orders_score_desc_then_time_asc(self):
+        results = [(50.0, 10), (90.0, 500), (90.0, 100), (89.9999, 1), (100.0, 9_999_999)]
+        ordered = sorted(results, key=lambda r: _sort_key(*r))
+        assert ordered == [(100.0, 9_999_999), (90.0, 100), (90.0, 500), (89.9999, 1), (50.0, 10)]
+
+    def test_equal_results_share_a_key(self):
+        assert _sort_key(72.5, 300) == _sort_key(72.5, 300)
+        assert _sort_key(72.5, 300) != _sort_key(72.5, 301)
+        assert _sort_key(0.0001, 0) < _sort_key(0.0, 0)
+
+    def test_key_is_exact_at_the_extremes(self):
+        # 100.0000 and the longest time still fit a double's 53-bit mantissa
+        assert _sort_key(100.0, 0) - _sort_key(100.0, 1) == -1
+        assert _sort_key(100.0, 9_999_999) < _sort_key(99.9999, 0)
+
+    def test_members_tie_break_by_numeric_user_id(self):
+        assert sorted([_member(10), _member(9), _member(100)]) == [
+            _member(9), _member(10), _member(100),
+        ]
+
+
+class TestRebuild:
+
+    def test_writes_ranking_entries_and_meta(self, exam, fake_redis):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        members = fake_redis.zrange(f"lb:{exam_id}:rank", 0, -1)
+        assert [int(m) for m in members] == ranked
+
+        entry = json_provider.loads(fake_redis.hget(f"lb:{exam_id}:entries", ranked[0]))
+        assert entry["user_id"] == ranked[0]
+        assert entry["total_score"] == 88.25
+
+        assert fake_redis.hgetall(f"lb:{exam_id}:meta") == {
+            b"exam_title": b"Store Exam", b"participant_count": b"5",
+        }
+
+    def test_replaces_the_previous_copy(self, exam, fake_redis):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        db.session.query(LeaderboardSnapshot).filter_by(user_id=ranked[0]).delete()
+        db.session.commit()
+        leaderboard_store.rebuild(exam_id)
+
+        assert [int(m) for m in fake_redis.zrange(f"lb:{exam_id}:rank", 0, -1)] == ranked[1:]
+        assert fake_redis.hget(f"lb:{exam_id}:entries", ranked[0]) is None
+        assert fake_redis.hget(f"lb:{exam_id}:meta", "participant_count") == b"4"
+
+    def test_unknown_exam_writes_nothing(self, app, fake_redis):
+        leaderboard_store.rebuild(999)
+        assert fake_redis.keys("lb:*") == []
+
+
+class TestReadPage:
+
+    def test_page_from_offset(self, exam):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        meta, entries = leaderboard_store.read_page(exam_id, 2, start=1)
+
+        assert meta == {"exam_title": "Store Exam", "participant_count": 5}
+        assert _ids(entries) == ranked[1:3]
+
+    def test_page_after_cursor(self, exam):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+        _, first = leaderboard_store.read_page(exam_id, 3)
+        last = first[-1]
+
+        _, rest = leaderboard_store.read_page(
+            exam_id, 3, after=(last["total_score"], last["total_time_sec"], last["user_id"], 3),
+        )
+
+        assert _ids(first) + _ids(rest) == ranked
+
+    def test_moved_cursor_row_falls_back(self, exam):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        # The cursor's row has since changed score
+        assert leaderboard_store.read_page(exam_id, 2, after=(1.0, 1, ranked[0])) is None
+        assert leaderboard_store.read_page(exam_id, 2, after=(1.0, 1, 999)) is None
+
+    def test_past_the_end_is_empty(self, exam):
+        exam_id, _ = exam
+        leaderboard_store.rebuild(exam_id)
+
+        meta, entries = leaderboard_store.read_page(exam_id, 10, start=5)
+        assert meta["participant_count"] == 5 and entries == []
+
+    def test_not_built_returns_none(self, exam):
+        exam_id, _ = exam
+        assert leaderboard_store.read_page(exam_id, 10) is None
+
+
+class TestReadEntry:
+
+    def test_participant(self, exam):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        available, payload = leaderboard_store.read_entry(exam_id, ranked[2])
+
+        assert available
+        assert json_provider.loads(payload)["user_id"] == ranked[2]
+
+    def test_non_participant(self, exam):
+        exam_id, _ = exam
+        leaderboard_store.rebuild(exam_id)
+        assert leaderboard_store.read_entry(exam_id, 999) == (True, None)
+
+    def test_not_built(self, exam):
+        exam_id, ranked = exam
+        assert leaderboard_store.read_entry(exam_id, ranked[0]) == (False, None)
+
+
+class TestUnavailable:
+
+    def test_without_redis(self, exam, monkeypatch, fake_redis):
+        exam_id, ranked = exam
+        monkeypatch.setattr(leaderboard_store, "_client", lambda: None)
+
+        leaderboard_store.rebuild(exam_id)
+
+        assert fake_redis.keys("lb:*") == []
+        assert leaderboard_store.read_page(exam_id, 10) is None
+        assert leaderboard_store.read_entry(exam_id, ranked[0]) == (False, None)
+
+    def test_redis_errors(self, exam, monkeypatch, fake_redis):
+        exam_id, ranked = exam
+        leaderboard_store.rebuild(exam_id)
+
+        def refuse(*args, **kwargs):
+            raise RedisConnectionError("down")
+
+        monkeypatch.setattr(type(fake_redis.pipeline()), "execute", refuse)
+
+        leaderboard_store.rebuild(exam_id)  # logged, not raised
+        assert leaderboard_store.read_page(exam_id, 10) is None
+        assert leaderboard_store.read_entry(exam_id, ranked[0]) == (False, None)
@@ -0,0 +1,223 @@
+"""
+Scoring Engine Tests — the scaled-integer weighting formula, input checks
+and the exam-weights cache.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from app import create_app
+from app.extensions import db, cache
+from app.models import User, Exam
+from app.services import scoring_engine
+from app.services.scoring_engine import _ModuleValues, _calculate_weighted_score
+
+_MODULES = ("coding", "quiz", "assessment")
+
+
+@pytest.fixture()
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture()
+def exam_id(app):
+    admin = User(
+        username="admin", email="admin@test.com",
+        full_name="Admin", password_hash="x", role="admin",
+    )
+    db.session.add(admin)
+    db.session.flush()
+
+    exam = Exam(
+        title="Weights Exam",
+        weight_coding=50, weight_quiz=30, weight_assessment=20,
+        max_score_coding=100, max_score_quiz=100, max_score_assessment=100,
+        status="active", created_by=admin.user_id,
+    )
+    db.session.add(exam)
+    db.session.commit()
+    return exam.exam_id
+
+
+def _exam_weights(weights=(50, 30, 20), max_scores=(100, 100, 100)):
+    """The (weight_map, max_map) pair as _exam_weights scales it."""
+    return (
+        {m: round(w * 100) for m, w in zip(_MODULES, weights)},
+        {m: round(s * 10_000) for m, s in zip(_MODULES, max_scores)},
+    )
+
+
+def _modules(*raw_scores, times=(0, 0, 0)):
+    return [
+        _ModuleValues(m, raw, t)
+        for m, raw, t in zip(_MODULES, raw_scores, times) if raw is not None
+    ]
+
+
+def _half_up(raw, max_score, weight) -> float:
+    """Reference: raw / max × weight, ROUND_HALF_UP to 4 decimals, in Decimal."""
+    value = Decimal(str(raw)) / Decimal(str(max_score)) * Decimal(str(weight))
+    return float(value.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP))
+
+
+class TestWeightedScore:
+
+    def test_default_weights(self):
+        result = _calculate_weighted_score(
+            _modules(80, 90, 70, times=(1000, 500, 800)), _exam_weights(),
+        )
+        assert result == {
+            "weighted_coding": 40.0,
+            "weighted_quiz": 27.0,
+            "weighted_assessment": 14.0,
+            "total_score": 81.0,
+            "total_time_sec": 2300,
+        }
+
+    @pytest.mark.parametrize("raw, max_score, weight, expected", [
+        (0.0001, 100, 50, 0.0001),   # 0.00005 → up
+        (0.0003, 100, 50, 0.0002),   # 0.00015 → up (float round() gives 0.0001)
+        (0.0001, 100, 30, 0.0),      # 0.00003 → down
+        (0.0004, 8, 1, 0.0001),      # 0.00005 → up, non-default max
+        (1, 3, 50, 16.6667),         # repeating decimal
+        (2, 3, 50, 33.3333),
+        (33.3335, 100, 30, 10.0001),  # 10.00005 → up
+        (66.665, 100, 25, 16.6663),   # 16.66625 → up
+    ])
+    def test_rounds_half_up_to_four_decimals(self, raw, max_score, weight, expected):
+        result = _calculate_weighted_score(
+            _modules(raw, None, None), _exam_weights((weight, 30, 20), (max_score, 100, 100)),
+        )
+        assert result["weighted_coding"] == expected == _half_up(raw, max_score, weight)
+
+    def test_non_default_weights_and_maxima(self):
+        weights, max_scores = (45.5, 34.25, 20.25), (50, 80, 150)
+        raws = (37.5, 61.2, 99.99)
+
+        result = _calculate_weighted_score(_modules(*raws), _exam_weights(weights, max_scores))
+
+        # 34.125 + 26.2013 (26.20125 up) + 13.4987 (13.49865 up)
+        assert result["weighted_coding"] == 34.125
+        assert result["weighted_quiz"] == 26.2013
+        assert result["weighted_assessment"] == 13.4987
+        assert result["total_score"] == 73.825
+        for module, raw, weight, max_score in zip(_MODULES, raws, weights, max_scores):
+            assert result[f"weighted_{module}"] == _half_up(raw, max_score, weight)
+
+    def test_total_is_sum_of_rounded_modules(self):
+        # Each module rounds up by 0.00005; the total adds the rounded parts
+        result = _calculate_weighted_score(
+            _modules(0.0001, 0.0001, 0.0001), _exam_weights((50, 50, 50)),
+        )
+        assert result["total_score"] == 0.0003
+
+    def test_full_marks(self):
+        result = _calculate_weighted_score(
+            _modules(100, 100, 100), _exam_weights((33.34, 33.33, 33.33)),
+        )
+        assert result["total_score"] == 100.0
+
+    def test_missing_module_counts_zero_and_no_time(self):
+        result = _calculate_weighted_score(
+            _modules(50, None, 100, times=(600, 0, 300)), _exam_weights(),
+        )
+        assert result["weighted_quiz"] == 0.0
+        assert result["total_score"] == 45.0
+        assert result["total_time_sec"] == 900
+
+    def test_zero_max_score_module_is_ignored(self):
+        result = _calculate_weighted_score(
+            _modules(0, 80, 70, times=(100, 200, 300)), _exam_weights(max_scores=(0, 100, 100)),
+        )
+        assert result["weighted_coding"] == 0.0
+        assert result["total_score"] == 38.0
+        assert result["total_time_sec"] == 500
+
+
+class TestSubmissionValidation:
+
+    @pytest.mark.parametrize("raw_score, max_score, time_spent_sec", [
+        (100.01, 100, 10),
+        (-1, 100, 10),
+        (50, 100, -1),
+    ], ids=["above-max", "negative-score", "negative-time"])
+    def test_rejected_before_the_transaction(
+        self, monkeypatch, raw_score, max_score, time_spent_sec,
+    ):
+        # Callers that bypass the API schema get the same checks
+        monkeypatch.setattr(
+            scoring_engine, "_atomic_score_update", lambda **_: pytest.fail("transaction opened"),
+        )
+        with pytest.raises(ValueError):
+            scoring_engine.submit_module_score(1, "quiz", raw_score, max_score, time_spent_sec)
+
+    def test_bulk_rejects_any_bad_row(self, monkeypatch):
+        monkeypatch.setattr(
+            scoring_engine, "_atomic_bulk_update", lambda rows: pytest.fail("transaction opened"),
+        )
+        with pytest.raises(ValueError):
+            scoring_engine.submit_module_scores_bulk([
+                {"session_id": 1, "module_type": "quiz", "raw_score": 50,
+                 "max_score": 100, "time_spent_sec": 10},
+                {"session_id": 2, "module_type": "quiz", "raw_score": 50,
+                 "max_score": 100, "time_spent_sec": -5},
+            ])
+
+
+class TestExamWeightsCache:
+
+    def test_weights_are_cached(self, exam_id):
+        weights = scoring_engine._exam_weights(exam_id)
+
+        assert weights == _exam_weights()
+        assert cache.get(scoring_engine._exam_weights_key(exam_id)) == weights
+
+    def test_committed_weight_change_evicts(self, exam_id):
+        scoring_engine._exam_weights(exam_id)
+
+        exam = db.session.get(Exam, exam_id)
+        exam.weight_coding, exam.weight_quiz = 60, 20
+        exam.max_score_assessment = 50
+        db.session.commit()
+
+        assert cache.get(scoring_engine._exam_weights_key(exam_id)) is None
+        assert scoring_engine._exam_weights(exam_id) == _exam_weights((60, 20, 20), (100, 100, 50))
+
+    def test_next_total_uses_new_weights(self, exam_id):
+        modules = _modules(80, 90, 70)
+        before = _calculate_weighted_score(modules, scoring_engine._exam_weights(exam_id))
+
+        exam = db.session.get(Exam, exam_id)
+        exam.weight_coding, exam.weight_quiz = 40, 40
+        db.session.commit()
+        after = _calculate_weighted_score(modules, scoring_engine._exam_weights(exam_id))
+
+        assert (before["total_score"], after["total_score"]) == (81.0, 82.0)
+
+    def test_rolled_back_change_keeps_cache(self, exam_id):
+        weights = scoring_engine._exam_weights(exam_id)
+
+        exam = db.session.get(Exam, exam_id)
+        exam.weight_coding, exam.weight_quiz = 60, 20
+        db.session.flush()
+        db.session.rollback()
+
+        assert cache.get(scoring_engine._exam_weights_key(exam_id)) == weights
+        assert "stale_exam_weights" not in db.session.info
+
+    def test_unrelated_change_keeps_cache(self, exam_id):
+        weights = scoring_engine._exam_weights(exam_id)
+
+        db.session.get(Exam, exam_id).title = "Renamed"
+        db.session.commit()
+
+        assert cache.get(scoring_engine._exam_weights_key(exam_id)) == weights
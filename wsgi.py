@@ -2,7 +2,7 @@
 WSGI entry point.
 
     flask run                       # development
-    gunicorn "app:create_app()" -w 4 -b 0.0.0.0:5000  # production
+    gunicorn -c gunicorn.conf.py wsgi:app  # production (gevent workers)
 """
 
 from app import create_app